@@ -7,13 +7,15 @@ import sh
 import pwd
 import sys
 import glob
+import json
 
 from doit import get_var
+from doit.action import CmdAction
 from ruamel import yaml
 from pathlib import Path
 from subprocess import check_call, check_output, CalledProcessError, PIPE
 
-from props.bot.cfg import CFG
+from props.bot.cfg import CFG, BUILDINFO_KEYS
 
 ## https://docs.docker.com/compose/compose-file/compose-versioning/
 MINIMUM_DOCKER_COMPOSE_VERSION = '1.13' # allows compose format 3.0
@@ -40,6 +42,15 @@ DOIT_CONFIG = {
 SPACE = ' '
 NEWLINE = '\n'
 
+## micro-benchmarks fail task_test when a mean relative to test_reference regresses past this fraction
+## against the stored baseline, so runners faster or slower than the recording machine compare fairly;
+## baselines are kept per pytest-benchmark machine id, record one for a new machine with `doit baseline`
+BENCHMARK_THRESHOLD = '0.25'
+BENCHMARK_BASELINES = f'{CFG.APP_TESTPATH}/bench/baselines'
+BENCHMARK_JSON = f'/tmp/{CFG.APP_PROJNAME}-micro.json'
+BENCHMARK_STORAGE = f'--benchmark-storage=file://{BENCHMARK_BASELINES}'
+BENCHMARK_PYTHONPATH = f'PYTHONPATH=.:{CFG.APP_PROJPATH}:{CFG.APP_BOTPATH}:$PYTHONPATH'
+
 DOCKER_COMPOSE_YML = yaml.safe_load(open(f'{CFG.APP_PROJPATH}/docker-compose.yml'))
 SVCS = DOCKER_COMPOSE_YML['services'].keys()
 
@@ -273,6 +284,61 @@ def task_test():
                     f'{PYTHONPATH} venv/bin/python3 -m pytest -s -vv {CFG.APP_TESTPATH}/{svc}',
                 ],
             }
+    threshold = get_var('threshold', BENCHMARK_THRESHOLD)
+    def micro():
+        command = f'{BENCHMARK_PYTHONPATH} venv/bin/python3 -m pytest -q {CFG.APP_TESTPATH}/bench {BENCHMARK_STORAGE}'
+        machine = check_output(
+            'venv/bin/python3 -c "from pytest_benchmark.utils import get_machine_id; print(get_machine_id())"',
+            shell=True).decode('utf-8').strip()
+        baselines = sorted(glob.glob(f'{BENCHMARK_BASELINES}/{machine}/*.json'))
+        if not baselines:
+            print(f'no micro-benchmark baseline for {machine}; run `doit baseline` to record one')
+            return command
+        return ' && '.join([
+            f'{command} --benchmark-json={BENCHMARK_JSON}',
+            f'venv/bin/python3 {CFG.APP_TESTPATH}/bench/compare.py {baselines[-1]} {BENCHMARK_JSON} --threshold {threshold}',
+        ])
+    yield {
+        'name': 'micro',
+        'task_dep': [
+            'noroot',
+            'venv',
+        ],
+        'actions': [
+            CmdAction(micro),
+        ],
+    }
+
+def task_baseline():
+    '''
+    record a micro-benchmark baseline for this machine; commit the file written to tests/bench/baselines/<machine id>
+    '''
+    return {
+        'task_dep': [
+            'noroot',
+            'venv',
+        ],
+        'actions': [
+            f'{BENCHMARK_PYTHONPATH} venv/bin/python3 -m pytest -q {CFG.APP_TESTPATH}/bench {BENCHMARK_STORAGE} --benchmark-save=baseline',
+        ],
+    }
+
+def task_bench():
+    '''
+    run the end-to-end load benchmark against an in-process fake slack api
+    '''
+    names = ['events', 'rate', 'users', 'latency', 'ratelimit', 'retries', 'replay']
+    args = ' '.join(f'--{name} {get_var(name)}' for name in names if get_var(name, None))
+    PYTHONPATH = f'PYTHONPATH={CFG.APP_BOTPATH}:$PYTHONPATH'
+    return {
+        'task_dep': [
+            'noroot',
+            'venv',
+        ],
+        'actions': [
+            f'{PYTHONPATH} venv/bin/python3 {CFG.APP_TESTPATH}/bench/bench.py {args}',
+        ],
+    }
 
 def task_tls():
     '''
@@ -311,9 +377,16 @@ def task_genenv():
         ],
     }
 
+def write_buildinfo(path):
+    '''
+    snapshot the git-derived build metadata so the container never runs git
+    '''
+    with open(path, 'w') as f:
+        json.dump({key: getattr(CFG, key) for key in BUILDINFO_KEYS}, f, indent=4, sort_keys=True)
+
 def task_tar():
     '''
-    tar up source files, dereferncing symlinks
+    tar up source files, plus buildinfo.json for the bot, dereferncing symlinks
     '''
     excludes = ' '.join([
         f'--exclude={CFG.APP_SRCTAR}',
@@ -326,16 +399,21 @@ def task_tar():
         ## it is important to not that this is required to keep the tarballs from
         ## genereating different checksums and therefore different layers in docker
         cmd = f'cd {CFG.APP_PROJPATH}/{svc} && tar cvh {excludes} . | gzip -n > {CFG.APP_SRCTAR}'
+        actions = [
+            f'echo "{cmd}"',
+            f'{cmd}',
+        ]
+        if svc == 'bot':
+            ## only the bot reads buildinfo.json; see load_buildinfo in props/bot/cfg.py
+            buildinfo = f'{CFG.APP_PROJPATH}/{svc}/buildinfo.json'
+            actions = [(write_buildinfo, [buildinfo])] + actions + [f'rm -f {buildinfo}']
         yield {
             'name': svc,
             'task_dep': [
                 'noroot',
                 'test',
             ],
-            'actions': [
-                f'echo "{cmd}"',
-                f'{cmd}',
-            ],
+            'actions': actions,
         }
 
 def task_build():
@@ -495,6 +573,34 @@ def task_rmcache():
         ],
     }
 
+def task_compact():
+    '''
+    fold the props journal into its snapshot; run with the bot stopped
+    '''
+    journal = get_var('journal', CFG.PROPS_JOURNAL or f'/data/{CFG.APP_PROJNAME}/journal')
+    return {
+        'task_dep': [
+            'venv',
+        ],
+        'actions': [
+            f'venv/bin/python3 {CFG.APP_BOTPATH}/journal.py {journal}',
+        ],
+    }
+
+def task_profile():
+    '''
+    aggregate the pstats files written by the profiling hook
+    '''
+    profiles = get_var('profiles', CFG.PROFILE_DIR)
+    return {
+        'task_dep': [
+            'venv',
+        ],
+        'actions': [
+            f'venv/bin/python3 {CFG.APP_BOTPATH}/profiling.py {profiles}',
+        ],
+    }
+
 def task_tidy():
     '''
     delete cached files
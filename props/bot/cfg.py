@@ -6,6 +6,7 @@ config
 
 import os
 import re
+import json
 import pwd
 import sys
 import time
@@ -31,6 +32,22 @@ logging.basicConfig(
 logging.Formatter.converter = time.gmtime
 log = logging.getLogger(__name__)
 
+BUILDINFO_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'buildinfo.json')
+
+SCHEMA = {
+    'SLACK_VERIFICATION_TOKEN': str,
+    'SLACK_TEAM_ID': str,
+    'PROPS_BOT_CHANNEL_ID': str,
+    'BOT_USER_OAUTH_ACCESS_TOKEN': str,
+}
+
+BUILDINFO_KEYS = [
+    'APP_VERSION',
+    'APP_BRANCH',
+    'APP_REVISION',
+    'APP_REMOTE_ORIGIN_URL',
+]
+
 class ProjNameSplitError(Exception):
     '''
     ProjNameSplitError
@@ -79,11 +96,60 @@ def git(*args, strip=True, **kwargs):
             raise NotGitRepoError
         log.error(e)
 
+def load_buildinfo(path=BUILDINFO_JSON):
+    '''
+    load the build metadata snapshot written by dodo.py, if there is one
+    '''
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+BUILDINFO = load_buildinfo()
+
+class cached_property: #pylint: disable=invalid-name,too-few-public-methods
+    '''
+    property computed on first access and then stored as a plain instance attribute
+    '''
+    def __init__(self, func):
+        '''
+        init
+        '''
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls):
+        '''
+        get
+        '''
+        if obj is None:
+            return self
+        value = obj.__dict__[self.func.__name__] = self.func(obj)
+        return value
+
 class AutoConfigPlus(AutoConfig): #pylint: disable=too-many-public-methods
     '''
     thin wrapper around AutoConfig adding some extra features
     '''
 
+    def __init__(self, *args, **kwargs):
+        '''
+        init
+        '''
+        self.resolved = set()
+        super(AutoConfigPlus, self).__init__(*args, **kwargs)
+
+    def invalidate(self, *args): #pylint: disable=unused-argument
+        '''
+        forget every value resolved by __getattr__ and reload the config file; usable as a signal handler
+        '''
+        for attr in self.resolved:
+            self.__dict__.pop(attr, None)
+        self.resolved = set()
+        self.config = None
+        log.info('config invalidated')
+
     @property
     def APP_UID(self):
         '''
@@ -143,7 +209,18 @@ class AutoConfigPlus(AutoConfig): #pylint: disable=too-many-public-methods
         '''
         return self('APP_MODULE', 'main:app')
 
-    @property
+    def build(self, key, *args):
+        '''
+        build metadata from buildinfo.json, else from git, else from the environment
+        '''
+        if key in BUILDINFO:
+            return BUILDINFO[key]
+        try:
+            return git(*args)
+        except NotGitRepoError:
+            return self(key)
+
+    @cached_property
     def APP_REPOROOT(self):
         '''
         reporoot
@@ -157,27 +234,21 @@ class AutoConfigPlus(AutoConfig): #pylint: disable=too-many-public-methods
         '''
         return self('APP_INSTALLPATH', '/usr/src/app')
 
-    @property
+    @cached_property
     def APP_VERSION(self):
         '''
         version
         '''
-        try:
-            return git('describe', '--abbrev=7', '--always')
-        except NotGitRepoError:
-            return self('APP_VERSION')
+        return self.build('APP_VERSION', 'describe', '--abbrev=7', '--always')
 
-    @property
+    @cached_property
     def APP_BRANCH(self):
         '''
         branch
         '''
-        try:
-            return git('rev-parse', '--abbrev-ref', 'HEAD')
-        except NotGitRepoError:
-            return self('APP_BRANCH')
+        return self.build('APP_BRANCH', 'rev-parse', '--abbrev-ref', 'HEAD')
 
-    @property
+    @cached_property
     def APP_DEPENV(self):
         '''
         deployment environment
@@ -199,27 +270,21 @@ class AutoConfigPlus(AutoConfig): #pylint: disable=too-many-public-methods
         except UndefinedValueError:
             return '.src.tar.gz'
 
-    @property
+    @cached_property
     def APP_REVISION(self):
         '''
         revision
         '''
-        try:
-            return git('rev-parse', 'HEAD')
-        except NotGitRepoError:
-            return self('APP_REVISION')
+        return self.build('APP_REVISION', 'rev-parse', 'HEAD')
 
-    @property
+    @cached_property
     def APP_REMOTE_ORIGIN_URL(self):
         '''
         remote origin url
         '''
-        try:
-            return git('config', '--get', 'remote.origin.url')
-        except NotGitRepoError:
-            return self('APP_REMOTE_ORIGIN_URL')
+        return self.build('APP_REMOTE_ORIGIN_URL', 'config', '--get', 'remote.origin.url')
 
-    @property
+    @cached_property
     def APP_REPONAME(self):
         '''
         reponame
@@ -228,7 +293,7 @@ class AutoConfigPlus(AutoConfig): #pylint: disable=too-many-public-methods
         match = re.search(pattern, self.APP_REMOTE_ORIGIN_URL)
         return match.group('reponame')
 
-    @property
+    @cached_property
     def APP_PROJNAME(self):
         '''
         projname
@@ -267,7 +332,7 @@ class AutoConfigPlus(AutoConfig): #pylint: disable=too-many-public-methods
         '''
         return os.path.join(self.APP_REPOROOT, 'tests')
 
-    @property
+    @cached_property
     def APP_LS_REMOTE(self):
         '''
         ls-remote
@@ -280,7 +345,7 @@ class AutoConfigPlus(AutoConfig): #pylint: disable=too-many-public-methods
             refname: revision for revision, refname in [line.split() for line in result.split('\n')]
         }
 
-    @property
+    @cached_property
     def APP_GSM_STATUS(self):
         '''
         gsm status
@@ -300,17 +365,354 @@ class AutoConfigPlus(AutoConfig): #pylint: disable=too-many-public-methods
             repopath: [revision, states[state]] for state, revision, repopath, _ in matches
         }
 
+    @property
+    def SLACK_API_URL(self):
+        '''
+        slack web api base url
+        '''
+        return self('SLACK_API_URL', 'https://slack.com/api')
+
+    @property
+    def SLACK_POOL_SIZE(self):
+        '''
+        max pooled connections to the slack web api
+        '''
+        return self('SLACK_POOL_SIZE', 10, cast=int)
+
+    @property
+    def SLACK_KEEPALIVE(self):
+        '''
+        seconds an idle slack connection is kept alive
+        '''
+        return self('SLACK_KEEPALIVE', 30, cast=int)
+
+    @property
+    def SLACK_TIMEOUT(self):
+        '''
+        seconds before a slack api call times out
+        '''
+        return self('SLACK_TIMEOUT', 10, cast=int)
+
+    @property
+    def INGEST_MODE(self):
+        '''
+        how slack events arrive: webhook (POST /slack/events) or socket (socket mode websocket)
+        '''
+        return self('INGEST_MODE', 'webhook')
+
+    @property
+    def SLACK_APP_TOKEN(self):
+        '''
+        app-level xapp- token with connections:write; required for socket mode
+        '''
+        return self('SLACK_APP_TOKEN', '')
+
+    @property
+    def SOCKET_HEARTBEAT(self):
+        '''
+        seconds between socket mode websocket pings
+        '''
+        return self('SOCKET_HEARTBEAT', 30, cast=int)
+
+    @property
+    def HEALTH_INTERVAL(self):
+        '''
+        seconds between background slack connectivity checks; /readyz serves the last outcome
+        '''
+        return self('HEALTH_INTERVAL', 60, cast=int)
+
+    @property
+    def WARMUP_TIMEOUT(self):
+        '''
+        seconds each startup warm-up step may take
+        '''
+        return self('WARMUP_TIMEOUT', 30, cast=int)
+
+    @property
+    def JSON_CODEC(self):
+        '''
+        json codec: auto, orjson, ujson or json; auto picks the fastest installed
+        '''
+        return self('JSON_CODEC', 'auto')
+
+    @property
+    def JSON_THREAD_THRESHOLD(self):
+        '''
+        bytes at which payloads are decoded in a worker thread instead of on the event loop
+        '''
+        return self('JSON_THREAD_THRESHOLD', 65536, cast=int)
+
+    @property
+    def SLACK_POST_RATE(self):
+        '''
+        chat.postMessage calls per second per channel
+        '''
+        return self('SLACK_POST_RATE', 1.0, cast=float)
+
+    @property
+    def SLACK_POST_BURST(self):
+        '''
+        chat.postMessage calls a channel may burst before pacing
+        '''
+        return self('SLACK_POST_BURST', 1, cast=int)
+
+    @property
+    def SLACK_POST_WINDOW(self):
+        '''
+        seconds replies to a channel are collected into one message
+        '''
+        return self('SLACK_POST_WINDOW', 0.5, cast=float)
+
+    @property
+    def SLACK_POST_MAXLINES(self):
+        '''
+        max reply lines merged into one chat.postMessage
+        '''
+        return self('SLACK_POST_MAXLINES', 50, cast=int)
+
+    @property
+    def SLACK_USERS_TTL(self):
+        '''
+        seconds between users.list directory refreshes
+        '''
+        return self('SLACK_USERS_TTL', 300, cast=int)
+
+    @property
+    def SLACK_USERS_LIMIT(self):
+        '''
+        users.list page size
+        '''
+        return self('SLACK_USERS_LIMIT', 200, cast=int)
+
+    @property
+    def EVENT_QUEUE_SIZE(self):
+        '''
+        max slack events waiting for a worker
+        '''
+        return self('EVENT_QUEUE_SIZE', 1000, cast=int)
+
+    @property
+    def EVENT_WORKERS(self):
+        '''
+        event pipeline workers
+        '''
+        return self('EVENT_WORKERS', 4, cast=int)
+
+    @property
+    def EVENT_DRAIN_TIMEOUT(self):
+        '''
+        seconds to drain the event queue, and then the outbox, on shutdown
+        '''
+        return self('EVENT_DRAIN_TIMEOUT', 10, cast=int)
+
+    @property
+    def EVENT_PARTITION_SHARE(self):
+        '''
+        fraction of the event queue any one channel may fill
+        '''
+        return self('EVENT_PARTITION_SHARE', 0.5, cast=float)
+
+    @property
+    def DEDUPE_SIZE(self):
+        '''
+        max event ids remembered for dedupe
+        '''
+        return self('DEDUPE_SIZE', 10000, cast=int)
+
+    @property
+    def DEDUPE_TTL(self):
+        '''
+        seconds an event id is remembered for dedupe, locally and in the postgres and sqlite stores
+        '''
+        return self('DEDUPE_TTL', 600, cast=int)
+
+    @property
+    def PROPS_CHANNELS(self):
+        '''
+        channels the bot is active in: "C1,C2:channel,C3:eng"; a bare channel uses
+        PROPS_NAMESPACE, :channel gives it a namespace of its own and * matches any channel
+        '''
+        try:
+            return self('PROPS_CHANNELS')
+        except UndefinedValueError:
+            return self.PROPS_BOT_CHANNEL_ID
+
+    @property
+    def PROPS_NAMESPACE(self):
+        '''
+        namespace of channels listed without one: global, channel or any shared name
+        '''
+        return self('PROPS_NAMESPACE', 'global')
+
+    @property
+    def PROPS_STORE(self):
+        '''
+        props store backend: memory, postgres, sqlite or crdt
+        '''
+        return self('PROPS_STORE', 'memory')
+
+    @property
+    def PROPS_WRITE_BEHIND(self):
+        '''
+        batch prop increments in memory before writing them to the store; ignored by the
+        in-process memory and crdt stores
+        '''
+        return self('PROPS_WRITE_BEHIND', False, cast=bool)
+
+    @property
+    def PROPS_FLUSH_SIZE(self):
+        '''
+        pending keys that trigger a write-behind flush
+        '''
+        return self('PROPS_FLUSH_SIZE', 100, cast=int)
+
+    @property
+    def PROPS_FLUSH_INTERVAL(self):
+        '''
+        seconds between write-behind flushes; also how long cached values may miss other workers
+        '''
+        return self('PROPS_FLUSH_INTERVAL', 1.0, cast=float)
+
+    @property
+    def SQLITE_PATH(self):
+        '''
+        sqlite store database file
+        '''
+        try:
+            return self('SQLITE_PATH')
+        except UndefinedValueError:
+            return f'/data/{self.APP_PROJNAME}/props.sqlite'
+
+    @property
+    def SQLITE_MMAP_SIZE(self):
+        '''
+        bytes of the sqlite database read through mmap
+        '''
+        return self('SQLITE_MMAP_SIZE', 268435456, cast=int)
+
+    @property
+    def SQLITE_SYNCHRONOUS(self):
+        '''
+        sqlite synchronous pragma; NORMAL is durable across crashes of the bot in wal mode
+        '''
+        return self('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+    @property
+    def CRDT_PATH(self):
+        '''
+        directory shared by the worker processes for the crdt store's shards
+        '''
+        return self('CRDT_PATH', '/tmp/props-crdt')
+
+    @property
+    def CRDT_SYNC_INTERVAL(self):
+        '''
+        seconds between crdt shard writes and merges
+        '''
+        return self('CRDT_SYNC_INTERVAL', 0.5, cast=float)
+
+    @property
+    def LEADERBOARD_TTL(self):
+        '''
+        seconds between leaderboard reloads from the store
+        '''
+        return self('LEADERBOARD_TTL', 300, cast=int)
+
+    @property
+    def PROPS_JOURNAL(self):
+        '''
+        props journal directory, one journal-N subdirectory per process; empty disables the journal
+        '''
+        return self('PROPS_JOURNAL', '')
+
+    @property
+    def JOURNAL_FLUSH_INTERVAL(self):
+        '''
+        seconds between journal group commits
+        '''
+        return self('JOURNAL_FLUSH_INTERVAL', 0.05, cast=float)
+
+    @property
+    def JOURNAL_FLUSH_SIZE(self):
+        '''
+        buffered journal records that trigger a group commit
+        '''
+        return self('JOURNAL_FLUSH_SIZE', 256, cast=int)
+
+    @property
+    def JOURNAL_SNAPSHOT_EVERY(self):
+        '''
+        journal records between snapshots
+        '''
+        return self('JOURNAL_SNAPSHOT_EVERY', 10000, cast=int)
+
+    @property
+    def DATABASE_URL(self):
+        '''
+        postgres dsn
+        '''
+        try:
+            return self('DATABASE_URL')
+        except UndefinedValueError:
+            user = self('POSTGRES_USER', 'postgres')
+            password = self('POSTGRES_PASSWORD', '')
+            database = self('POSTGRES_DB', user)
+            return f'postgresql://{user}:{password}@db:5432/{database}'
+
+    @property
+    def DB_POOL_MIN(self):
+        '''
+        min pooled db connections
+        '''
+        return self('DB_POOL_MIN', 1, cast=int)
+
+    @property
+    def DB_POOL_MAX(self):
+        '''
+        max pooled db connections
+        '''
+        return self('DB_POOL_MAX', 10, cast=int)
+
+    @property
+    def PROFILE_RATE(self):
+        '''
+        fraction of requests and events profiled; 0 disables sampling
+        '''
+        return self('PROFILE_RATE', 0.0, cast=float)
+
+    @property
+    def PROFILE_SECRET(self):
+        '''
+        hmac secret for the X-Props-Profile header; empty disables it. a signed /slack/events
+        request also profiles the worker handling its event
+        '''
+        return self('PROFILE_SECRET', '')
+
+    @property
+    def PROFILE_DIR(self):
+        '''
+        directory profiles are written to
+        '''
+        return self('PROFILE_DIR', '/tmp/props-profiles')
+
     def __getattr__(self, attr):
         '''
-        getattr
+        getattr; the value is cast once, by SCHEMA if declared, and then stored as a
+        plain instance attribute so later reads skip __getattr__ until invalidate()
         '''
         log.info(f'attr = {attr}')
         if attr == 'create_doit_tasks': #note: to keep pydoit's hands off
             return lambda: None
-        result = self(attr)
-        try:
-            return int(result)
-        except ValueError:
-            return result
+        if attr in SCHEMA:
+            result = self(attr, cast=SCHEMA[attr])
+        else:
+            result = self(attr)
+            try:
+                result = int(result)
+            except ValueError:
+                pass
+        self.__dict__[attr] = result
+        self.resolved.add(attr)
+        return result
 
 CFG = AutoConfigPlus()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+codec
+'''
+
+import json
+import asyncio
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None #pylint: disable=invalid-name
+
+try:
+    import ujson
+except ImportError:
+    ujson = None #pylint: disable=invalid-name
+
+log = logging.getLogger(__name__)
+
+class UnknownCodecError(Exception):
+    '''
+    UnknownCodecError
+    '''
+    def __init__(self, name):
+        '''
+        init
+        '''
+        msg = f'unknown or unavailable json codec; name = {name}'
+        super(UnknownCodecError, self).__init__(msg)
+
+class JSONCodec:
+    '''
+    stdlib json; the fallback every other codec defers to for what it cannot do
+    '''
+    name = 'json'
+
+    def __init__(self, threshold=65536):
+        '''
+        init; payloads of threshold bytes or more are decoded in the default executor
+        '''
+        self.threshold = threshold
+
+    def loads(self, data):
+        '''
+        decode str or bytes
+        '''
+        return json.loads(data)
+
+    def dumps(self, obj, indent=None, sort_keys=False, compact=False):
+        '''
+        encode to str; compact drops the separator whitespace
+        '''
+        if compact:
+            return json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys)
+        return json.dumps(obj, indent=indent, sort_keys=sort_keys)
+
+    async def decode(self, data):
+        '''
+        decode, off the event loop when data is large
+        '''
+        if len(data) < self.threshold:
+            return self.loads(data)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.loads, data)
+
+class UJSONCodec(JSONCodec):
+    '''
+    ujson
+    '''
+    name = 'ujson'
+
+    def loads(self, data):
+        '''
+        loads
+        '''
+        return ujson.loads(data)
+
+    def dumps(self, obj, indent=None, sort_keys=False, compact=False):
+        '''
+        dumps; compact wins over indent, indented output keeps the stdlib layout
+        '''
+        if indent and not compact:
+            return super(UJSONCodec, self).dumps(obj, indent=indent, sort_keys=sort_keys, compact=compact)
+        return ujson.dumps(obj, sort_keys=sort_keys, ensure_ascii=False, escape_forward_slashes=False)
+
+class OrjsonCodec(JSONCodec):
+    '''
+    orjson
+    '''
+    name = 'orjson'
+
+    def loads(self, data):
+        '''
+        loads
+        '''
+        return orjson.loads(data)
+
+    def dumps(self, obj, indent=None, sort_keys=False, compact=False):
+        '''
+        dumps; compact wins over indent, and as orjson only indents by 2 indented output
+        keeps the stdlib layout
+        '''
+        if indent and not compact:
+            return super(OrjsonCodec, self).dumps(obj, indent=indent, sort_keys=sort_keys, compact=compact)
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0).decode('utf-8')
+
+CODECS = {
+    'orjson': (OrjsonCodec, lambda: orjson is not None),
+    'ujson': (UJSONCodec, lambda: ujson is not None),
+    'json': (JSONCodec, lambda: True),
+}
+
+def make_codec(name='auto', threshold=65536):
+    '''
+    the named codec, or with auto the fastest one installed
+    '''
+    if name == 'auto':
+        name = next(name for name, (_, available) in CODECS.items() if available())
+    if name not in CODECS or not CODECS[name][1]():
+        raise UnknownCodecError(name)
+    log.info(f'json codec = {name}')
+    return CODECS[name][0](threshold=threshold)
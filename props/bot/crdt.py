@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+crdt
+'''
+
+import os
+import json
+import glob
+import logging
+
+from locks import claim, release
+
+log = logging.getLogger(__name__)
+
+SHARD = 'shard-{}.json'
+LOCK = 'shard-{}.lock'
+
+class PNCounter:
+    '''
+    per-key pn-counters replicated as one shard per replica; a replica only ever
+    grows its own (p, n) pairs, so merging any copy of a shard by elementwise max
+    is idempotent and order-free and no increment is lost or counted twice
+    '''
+    def __init__(self, replica):
+        '''
+        init
+        '''
+        self.replica = replica
+        self.shards = {replica: {}}
+        self.totals = {}
+
+    @property
+    def shard(self):
+        '''
+        this replica's {key: (p, n)}
+        '''
+        return self.shards[self.replica]
+
+    def incr(self, key, delta):
+        '''
+        add delta to key in this replica's shard
+        '''
+        p, n = self.shard.get(key, (0, 0))
+        self.shard[key] = (p + delta, n) if delta > 0 else (p, n - delta)
+        self.totals[key] = self.totals.get(key, 0) + delta
+
+    def value(self, key):
+        '''
+        merged value of key
+        '''
+        return self.totals.get(key, 0)
+
+    def merge(self, replica, shard):
+        '''
+        fold in a copy of replica's {key: (p, n)}
+        '''
+        ours = self.shards.setdefault(replica, {})
+        for key, (p, n) in shard.items():
+            old_p, old_n = ours.get(key, (0, 0))
+            new_p, new_n = max(p, old_p), max(n, old_n)
+            if (new_p, new_n) != (old_p, old_n):
+                ours[key] = (new_p, new_n)
+                self.totals[key] = self.totals.get(key, 0) + (new_p - new_n) - (old_p - old_n)
+
+def dump_shard(shard):
+    '''
+    shard as json rows of [scope, name, prop, p, n]
+    '''
+    return json.dumps([list(key) + [p, n] for key, (p, n) in shard.items()])
+
+def load_shard(text):
+    '''
+    inverse of dump_shard
+    '''
+    return {tuple(row[:-2]): (row[-2], row[-1]) for row in json.loads(text)}
+
+class ShardFiles:
+    '''
+    a directory of shard files, one per replica; each process claims the lowest
+    shard whose lock is free and resumes it, so restarts and crashes reuse shards
+    instead of piling up new ones
+    '''
+    def __init__(self, path):
+        '''
+        init
+        '''
+        self.path = path
+        self.lock = None
+        self.replica = None
+
+    def claim(self):
+        '''
+        lock a free shard for this process; returns its replica id
+        '''
+        self.lock, number = claim(self.path, LOCK)
+        self.replica = str(number)
+        log.info(f'crdt shard {self.replica} claimed in {self.path}')
+        return self.replica
+
+    def release(self):
+        '''
+        unlock the claimed shard
+        '''
+        if self.lock:
+            release(self.lock)
+            self.lock = None
+
+    def write(self, text):
+        '''
+        atomically replace this replica's shard file
+        '''
+        filename = os.path.join(self.path, SHARD.format(self.replica))
+        tmp = f'{filename}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filename)
+
+    def read(self):
+        '''
+        every shard file as {replica: text}
+        '''
+        texts = {}
+        for filename in glob.glob(os.path.join(self.path, SHARD.format('*'))):
+            replica = os.path.basename(filename)[len('shard-'):-len('.json')]
+            try:
+                with open(filename) as f:
+                    texts[replica] = f.read()
+            except OSError as ex:
+                log.warning(f'crdt shard {filename} unreadable: {ex}')
+        return texts
+
+    def sync(self, text):
+        '''
+        write this replica's shard and read every shard; runs off the event loop
+        '''
+        self.write(text)
+        return self.read()
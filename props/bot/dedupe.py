@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+dedupe
+'''
+
+import time
+
+from collections import OrderedDict
+
+class DedupeCache:
+    '''
+    bounded set of recently seen event ids; entries expire after ttl seconds
+    '''
+    def __init__(self, maxsize=10000, ttl=600):
+        '''
+        init
+        '''
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        '''
+        len
+        '''
+        return len(self.entries)
+
+    @property
+    def stats(self):
+        '''
+        stats
+        '''
+        return dict(size=len(self), maxsize=self.maxsize, hits=self.hits, misses=self.misses)
+
+    def evict(self, now):
+        '''
+        drop expired entries; insertion order is expiry order since ttl is fixed
+        '''
+        while self.entries:
+            key, expiry = next(iter(self.entries.items()))
+            if expiry > now:
+                return
+            del self.entries[key]
+
+    def seen(self, key):
+        '''
+        True if key was seen within ttl, otherwise record it and return False
+        '''
+        now = time.monotonic()
+        self.evict(now)
+        if key in self.entries:
+            self.hits += 1
+            return True
+        self.misses += 1
+        self.entries[key] = now + self.ttl
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return False
+
+    def forget(self, key):
+        '''
+        forget key so a redelivery is handled again
+        '''
+        self.entries.pop(key, None)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+directory
+'''
+
+import time
+import asyncio
+import logging
+
+from models import Member
+
+log = logging.getLogger(__name__)
+
+class MembersListError(Exception):
+    '''
+    MembersListError
+    '''
+    def __init__(self, json):
+        '''
+        init
+        '''
+        msg = f'users.list error; json = {json}'
+        super(MembersListError, self).__init__(msg)
+
+class UserDirectory:
+    '''
+    cached workspace user directory, indexed by member id and by name
+    '''
+    events = ('team_join', 'user_change')
+
+    def __init__(self, slack=None, ttl=300, limit=200, backoff=1, maxbackoff=60):
+        '''
+        init
+        '''
+        self.slack = slack
+        self.ttl = ttl
+        self.limit = limit
+        self.backoff = backoff
+        self.maxbackoff = maxbackoff
+        self.names = {}
+        self.ids = {}
+        self.refreshed = None
+        self.task = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        '''
+        len
+        '''
+        return len(self.ids)
+
+    def __contains__(self, name):
+        '''
+        contains
+        '''
+        return name in self.ids
+
+    def id_for(self, name):
+        '''
+        member id for name or None
+        '''
+        member_id = self.ids.get(name)
+        if member_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return member_id
+
+    def name_for(self, member_id):
+        '''
+        name for member id or None
+        '''
+        return self.names.get(member_id)
+
+    async def fetch(self):
+        '''
+        fetch every member from users.list, following the pagination cursor
+        '''
+        members, cursor = [], None
+        while True:
+            kwargs = dict(limit=self.limit)
+            if cursor:
+                kwargs['cursor'] = cursor
+            json = await self.slack.api_call('users.list', **kwargs)
+            if 'members' not in json:
+                raise MembersListError(json)
+            members += [Member.from_json(member) for member in json['members']]
+            cursor = json.get('response_metadata', {}).get('next_cursor')
+            if not cursor:
+                return members
+
+    def load(self, members):
+        '''
+        rebuild both indexes from a full member list and swap them in
+        '''
+        names, ids = {}, {}
+        for member in members:
+            if member.deleted:
+                continue
+            names[member.id] = member.name
+            ids[member.name] = member.id
+        self.names, self.ids = names, ids
+        self.refreshed = time.time()
+        log.info(f'directory loaded {len(ids)} members')
+
+    async def refresh(self):
+        '''
+        refetch users.list and reload the indexes
+        '''
+        members = await self.fetch()
+        self.load(members)
+
+    async def refresher(self):
+        '''
+        refresh every ttl seconds until cancelled; a directory loaded less than ttl
+        seconds ago, e.g. by the startup warm-up, is not refetched straight away and
+        a failed refresh is retried with backoff rather than after a whole ttl
+        '''
+        delay = self.backoff
+        while True:
+            if self.refreshed is None or time.time() - self.refreshed >= self.ttl:
+                try:
+                    await self.refresh()
+                except Exception as ex: #pylint: disable=broad-except
+                    log.error(f'directory refresh failed; retrying in {delay}s: {ex}')
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.maxbackoff)
+                    continue
+                delay = self.backoff
+            await asyncio.sleep(self.ttl)
+
+    def start(self):
+        '''
+        start the background refresher
+        '''
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.refresher())
+
+    async def stop(self):
+        '''
+        stop the background refresher
+        '''
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def apply(self, event):
+        '''
+        apply a team_join or user_change event to the indexes
+        '''
+        member = event.user
+        if member is None or isinstance(member, str):
+            return
+        member_id = member.id
+        old = self.names.pop(member_id, None)
+        if old is not None and self.ids.get(old) == member_id:
+            del self.ids[old]
+        if not member.deleted:
+            self.names[member_id] = member.name
+            self.ids[member.name] = member_id
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+health
+'''
+
+import time
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+class Health:
+    '''
+    startup warm-up plus readiness from cached state: checks are cheap callables
+    read on every probe, reports are checks shown alongside them that never gate
+    readiness, probes are coroutines refreshed in the background so that answering
+    /readyz never waits on slack
+    '''
+    def __init__(self, checks=None, reports=None, probes=None, interval=60, timeout=30):
+        '''
+        init
+        '''
+        self.checks = checks or {}
+        self.reports = reports or {}
+        self.probes = probes or {}
+        self.interval = interval
+        self.timeout = timeout
+        self.started = time.time()
+        self.steps = {}
+        self.warm = False
+        self.task = None
+
+    async def step(self, name, func):
+        '''
+        run one warm-up step and record how it went; a step returning False failed
+        '''
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(func(), self.timeout)
+            error = 'returned False' if result is False else None
+        except Exception as ex: #pylint: disable=broad-except
+            error = str(ex) or type(ex).__name__
+        if error:
+            log.warning(f'warm-up {name} failed: {error}')
+        self.steps[name] = dict(ok=error is None, seconds=round(time.monotonic() - start, 3), error=error)
+
+    async def warmup(self, **steps):
+        '''
+        run every {name: coroutine function} step concurrently, each bounded by timeout
+        '''
+        await asyncio.gather(*[self.step(name, func) for name, func in steps.items()])
+        self.warm = True
+        log.info(f'warm-up done; steps = {self.steps}')
+
+    def ready(self):
+        '''
+        (ready, {check: bool}); ready once warm and every check passes, whatever the reports say
+        '''
+        checks = dict(warm=self.warm)
+        checks.update((name, bool(check())) for name, check in self.checks.items())
+        ready = all(checks.values())
+        checks.update((name, bool(report())) for name, report in self.reports.items())
+        return ready, checks
+
+    @property
+    def uptime(self):
+        '''
+        seconds since start
+        '''
+        return round(time.time() - self.started, 3)
+
+    async def prober(self):
+        '''
+        refresh every probe each interval seconds until cancelled
+        '''
+        while True:
+            await asyncio.sleep(self.interval)
+            for name, probe in self.probes.items():
+                try:
+                    await probe()
+                except Exception as ex: #pylint: disable=broad-except
+                    log.error(f'health probe {name} failed: {ex}')
+
+    def start(self):
+        '''
+        start the background prober
+        '''
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.prober())
+
+    async def stop(self):
+        '''
+        stop the background prober
+        '''
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+journal
+'''
+
+import os
+import sys
+import glob
+import json
+import time
+import asyncio
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from partitions import GLOBAL_SCOPE
+from locks import claim, release
+
+log = logging.getLogger(__name__)
+
+JOURNAL = 'journal.jsonl'
+SNAPSHOT = 'snapshot.json'
+PROCESS = 'journal-{}'
+LOCK = 'journal-{}.lock'
+
+def read(path):
+    '''
+    load the snapshot in path and replay the journal tail; returns (values, seq, snapshot_seq, end)
+    where end is the byte offset just past the last intact record; entries written before
+    scopes existed belong to the global scope
+    '''
+    values, seq = {}, 0
+    snapshot = os.path.join(path, SNAPSHOT)
+    if os.path.exists(snapshot):
+        with open(snapshot) as f:
+            data = json.load(f)
+        seq = data['seq']
+        for entry in data['values']:
+            if len(entry) == 3:
+                entry = [GLOBAL_SCOPE] + entry
+            scope, name, prop, value = entry
+            values[scope, name, prop] = value
+    snapshot_seq, end = seq, 0
+    journal = os.path.join(path, JOURNAL)
+    if os.path.exists(journal):
+        with open(journal, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('unterminated record')
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    log.warning(f'journal {journal} has a torn record after seq {seq}')
+                    break
+                end += len(line)
+                if record['seq'] <= snapshot_seq:
+                    continue
+                key = (record.get('scope', GLOBAL_SCOPE), record['name'], record['prop'])
+                values[key] = values.get(key, 0) + record['delta']
+                seq = record['seq']
+    return values, seq, snapshot_seq, end
+
+def journals(path):
+    '''
+    every per-process journal directory under path, plus path itself when it holds
+    a journal written before journals were per process
+    '''
+    paths = sorted(glob.glob(os.path.join(path, PROCESS.format('*'))))
+    paths = [directory for directory in paths if os.path.isdir(directory)]
+    if any(os.path.exists(os.path.join(path, name)) for name in (JOURNAL, SNAPSHOT)):
+        paths.append(path)
+    return paths
+
+def recover(path):
+    '''
+    the sum of every journal under path as {key: value}
+    '''
+    values = {}
+    for directory in journals(path):
+        for key, value in read(directory)[0].items():
+            values[key] = values.get(key, 0) + value
+    return values
+
+def write_snapshot(path, values, seq):
+    '''
+    atomically replace the snapshot in path with values as of seq
+    '''
+    snapshot = os.path.join(path, SNAPSHOT)
+    tmp = f'{snapshot}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(dict(seq=seq, values=[[scope, name, prop, value] for (scope, name, prop), value in values.items()]), f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, snapshot)
+
+def fold(path):
+    '''
+    fold the journal in path into its snapshot and truncate it; returns the records folded
+    '''
+    values, seq, snapshot_seq, _ = read(path)
+    write_snapshot(path, values, seq)
+    with open(os.path.join(path, JOURNAL), 'w') as f:
+        os.fsync(f.fileno())
+    return seq - snapshot_seq
+
+def compact(path):
+    '''
+    fold every journal under path into its snapshot; run with the bot stopped
+    '''
+    return sum(fold(directory) for directory in journals(path))
+
+class Journal:
+    '''
+    append-only journal of prop mutations with group-commit fsyncs and periodic snapshots;
+    every worker process claims a journal-N directory of its own under root, so seqs,
+    snapshots and truncation never cross processes
+    '''
+    def __init__(self, root, interval=0.05, size=256, every=10000):
+        '''
+        init
+        '''
+        self.root = root
+        self.path = None
+        self.claimed = None
+        self.interval = interval
+        self.size = size
+        self.every = every
+        self.values = {}
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.buffer = []
+        self.file = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.lock = None
+        self.task = None
+
+    async def open(self):
+        '''
+        claim a journal, recover it and start the flusher; returns the {key: value}
+        recovered from every process's journal
+        '''
+        loop = asyncio.get_event_loop()
+        self.claimed, number = claim(self.root, LOCK)
+        self.path = os.path.join(self.root, PROCESS.format(number))
+        self.values, self.seq, self.snapshot_seq = await loop.run_in_executor(self.executor, self.recover, number == 0)
+        log.info(f'journal {self.path} recovered {len(self.values)} keys at seq {self.seq}')
+        self.lock = asyncio.Lock()
+        self.task = asyncio.ensure_future(self.flusher())
+        return await loop.run_in_executor(self.executor, recover, self.root)
+
+    def recover(self, adopt):
+        '''
+        read the claimed journal and cut any torn tail off before appending to it;
+        with adopt, a journal from before per-process journals becomes this one
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        if adopt and not any(os.path.exists(os.path.join(self.path, name)) for name in (JOURNAL, SNAPSHOT)):
+            for name in (SNAPSHOT, JOURNAL):
+                if os.path.exists(os.path.join(self.root, name)):
+                    os.replace(os.path.join(self.root, name), os.path.join(self.path, name))
+        values, seq, snapshot_seq, end = read(self.path)
+        journal = os.path.join(self.path, JOURNAL)
+        if os.path.exists(journal) and os.path.getsize(journal) > end:
+            log.warning(f'journal {journal} truncated from {os.path.getsize(journal)} to {end} bytes')
+            with open(journal, 'r+b') as f:
+                f.truncate(end)
+                os.fsync(f.fileno())
+        self.file = open(journal, 'a')
+        return values, seq, snapshot_seq
+
+    async def close(self):
+        '''
+        stop the flusher, commit what is buffered and close the journal
+        '''
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.flush()
+        self.file.close()
+        self.executor.shutdown()
+        release(self.claimed)
+        self.claimed = None
+
+    def append(self, who, key, operator, operand, delta, event_id=None): #pylint: disable=too-many-arguments
+        '''
+        buffer one mutation; committed by the next flush
+        '''
+        scope, name, prop = key
+        self.seq += 1
+        self.buffer.append(dict(
+            seq=self.seq,
+            ts=time.time(),
+            who=who,
+            scope=scope,
+            name=name,
+            prop=prop,
+            operator=operator,
+            operand=operand,
+            delta=delta,
+            event_id=event_id))
+        self.values[key] = self.values.get(key, 0) + delta
+        if len(self.buffer) >= self.size:
+            asyncio.ensure_future(self.flush())
+
+    def write(self, records):
+        '''
+        append records and fsync once for the whole group
+        '''
+        self.file.write(''.join(json.dumps(record) + '\n' for record in records))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def rotate(self, values, seq):
+        '''
+        snapshot values as of seq, then truncate the journal it covers
+        '''
+        write_snapshot(self.path, values, seq)
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    async def flush(self):
+        '''
+        commit buffered records; snapshot once every records have accumulated
+        '''
+        async with self.lock:
+            if not self.buffer:
+                return
+            records, self.buffer = self.buffer, []
+            loop = asyncio.get_event_loop()
+            try:
+                await loop.run_in_executor(self.executor, self.write, records)
+            except Exception:
+                self.buffer = records + self.buffer
+                raise
+            if self.seq - self.snapshot_seq >= self.every:
+                values, seq = dict(self.values), self.seq
+                await loop.run_in_executor(self.executor, self.rotate, values, seq)
+                self.snapshot_seq = seq
+                log.info(f'journal snapshot at seq {seq}')
+
+    async def flusher(self):
+        '''
+        flush every interval seconds until cancelled
+        '''
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as ex: #pylint: disable=broad-except
+                log.error(f'journal flush failed: {ex}')
+
+if __name__ == '__main__':
+    print(f'compacted {compact(sys.argv[1])} records')
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+leaderboard
+'''
+
+import asyncio
+import logging
+
+from bisect import bisect_left, insort
+
+from partitions import GLOBAL_SCOPE
+
+log = logging.getLogger(__name__)
+
+class Leaderboard:
+    '''
+    per-scope, per-prop rankings kept sorted as values change
+    '''
+    def __init__(self, ttl=300):
+        '''
+        init
+        '''
+        self.ttl = ttl
+        self.ranks = {}
+        self.values = {}
+        self.names = {}
+        self.task = None
+
+    def __len__(self):
+        '''
+        len
+        '''
+        return len(self.values)
+
+    def props(self, scope=GLOBAL_SCOPE):
+        '''
+        props that have a ranking in scope
+        '''
+        return sorted(prop for ranked, prop in self.ranks if ranked == scope)
+
+    def set(self, key, value):
+        '''
+        set the value of (scope, name, prop) and move it to its new rank
+        '''
+        scope, name, prop = key
+        ranking = self.ranks.setdefault((scope, prop), [])
+        old = self.values.get(key)
+        if old is not None:
+            del ranking[bisect_left(ranking, (-old, name))]
+        insort(ranking, (-value, name))
+        self.values[key] = value
+        self.names.setdefault((scope, name), {})[prop] = value
+
+    def update(self, values):
+        '''
+        set every {key: value}
+        '''
+        for key, value in values.items():
+            self.set(key, value)
+
+    def load(self, items):
+        '''
+        rebuild every ranking from {key: value} and swap them in
+        '''
+        ranks, names = {}, {}
+        for (scope, name, prop), value in items.items():
+            ranks.setdefault((scope, prop), []).append((-value, name))
+            names.setdefault((scope, name), {})[prop] = value
+        for ranking in ranks.values():
+            ranking.sort()
+        self.ranks, self.values, self.names = ranks, dict(items), names
+
+    def top(self, prop, count=10, scope=GLOBAL_SCOPE):
+        '''
+        the count highest (name, value) pairs for prop in scope
+        '''
+        return [(name, -value) for value, name in self.ranks.get((scope, prop), [])[:count]]
+
+    def show(self, name, scope=GLOBAL_SCOPE):
+        '''
+        every {prop: value} of name in scope
+        '''
+        return dict(self.names.get((scope, name), {}))
+
+    async def refresher(self, store):
+        '''
+        reload from store every ttl seconds, picking up other workers' updates
+        '''
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                self.load(await store.items())
+            except Exception as ex: #pylint: disable=broad-except
+                log.error(f'leaderboard reload failed: {ex}')
+
+    async def start(self, store):
+        '''
+        start the background refresher and load from store; the refresher retries
+        if this first load fails
+        '''
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.refresher(store))
+        self.load(await store.items())
+
+    async def stop(self):
+        '''
+        stop the background refresher
+        '''
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+locks
+'''
+
+import os
+import fcntl
+
+from itertools import count
+
+def claim(path, pattern):
+    '''
+    flock the lowest numbered file pattern.format(number) in path that no other
+    process holds; returns (lock file, number). the kernel drops the lock when the
+    process exits, so a crashed process frees its number for the next one
+    '''
+    os.makedirs(path, exist_ok=True)
+    for number in count():
+        lock = open(os.path.join(path, pattern.format(number)), 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            continue
+        return lock, number
+
+def release(lock):
+    '''
+    unlock and close a file returned by claim
+    '''
+    fcntl.flock(lock, fcntl.LOCK_UN)
+    lock.close()
@@ -5,19 +5,39 @@ props bot
 '''
 
 import os
+import signal
+import asyncio
+import time
+import hashlib
+import logging
 
-from json import dumps
 from ruamel import yaml
-from quart import abort, Quart, request, Response
+from quart import abort, g, Quart, request, Response
 from quart.helpers import make_response
-from attrdict import AttrDict
-from slackclient import SlackClient
 
 from utils.dbg import dbg
 from utils.dictionary import merge
-from cfg import CFG
+from cfg import CFG, BUILDINFO_KEYS
+from codec import make_codec
 
-from propsbot import PropsBot
+from propsbot import PropsBot, DEFAULT_PROP
+from models import Event
+from slackapi import SlackAPI
+from directory import UserDirectory
+from membership import ChannelMembership
+from pipeline import EventPipeline
+from store import make_store
+from dedupe import DedupeCache
+from outbox import Outbox
+from leaderboard import Leaderboard
+from journal import Journal
+from profiling import Profiler
+from socketmode import SocketMode
+from partitions import Partitions, parse_channels
+from health import Health
+from metrics import REGISTRY, CONTENT_TYPE, counter, histogram, callback
+
+log = logging.getLogger(__name__)
 
 app = Quart(__name__)
 
@@ -29,60 +49,251 @@ CONTRIBUTE_JSON = yaml.safe_load(open(f'{SCRIPT_PATH}/contribute.json'))
 
 PROPS = {}
 
-async def jsonify(status=200, indent=4, sort_keys=True, **kwargs):
+STATIC = {}
+
+CODEC = make_codec(CFG.JSON_CODEC, threshold=CFG.JSON_THREAD_THRESHOLD)
+SLACK = SlackAPI(
+    url=CFG.SLACK_API_URL,
+    limit=CFG.SLACK_POOL_SIZE,
+    keepalive=CFG.SLACK_KEEPALIVE,
+    timeout=CFG.SLACK_TIMEOUT,
+    codec=CODEC,
+    ttl=CFG.HEALTH_INTERVAL)
+DIRECTORY = UserDirectory(SLACK, ttl=CFG.SLACK_USERS_TTL, limit=CFG.SLACK_USERS_LIMIT)
+MEMBERSHIP = ChannelMembership(SLACK)
+PARTITIONS = Partitions(parse_channels(CFG.PROPS_CHANNELS, CFG.PROPS_NAMESPACE), membership=MEMBERSHIP)
+STORE = make_store(CFG)
+OUTBOX = Outbox(
+    SLACK,
+    rate=CFG.SLACK_POST_RATE,
+    burst=CFG.SLACK_POST_BURST,
+    window=CFG.SLACK_POST_WINDOW,
+    maxlines=CFG.SLACK_POST_MAXLINES,
+    timeout=CFG.EVENT_DRAIN_TIMEOUT)
+JOURNAL = Journal(
+    CFG.PROPS_JOURNAL,
+    interval=CFG.JOURNAL_FLUSH_INTERVAL,
+    size=CFG.JOURNAL_FLUSH_SIZE,
+    every=CFG.JOURNAL_SNAPSHOT_EVERY) if CFG.PROPS_JOURNAL else None
+LEADERBOARD = Leaderboard(ttl=CFG.LEADERBOARD_TTL)
+DEDUPE = DedupeCache(maxsize=CFG.DEDUPE_SIZE, ttl=CFG.DEDUPE_TTL)
+PROFILER = Profiler(CFG.PROFILE_DIR, rate=CFG.PROFILE_RATE, secret=CFG.PROFILE_SECRET)
+
+REQUESTS = counter('props_http_requests_total', 'http requests by route and status', ['route', 'method', 'status'])
+REQUEST_SECONDS = histogram('props_http_request_seconds', 'http request latency by route', ['route', 'method'])
+callback('props_event_queue_depth', 'slack events waiting for a worker', lambda: PIPELINE.depth)
+callback('props_event_queue_dropped_total', 'slack events dropped on a full queue', lambda: PIPELINE.dropped, type='counter')
+callback('props_cache_hits_total', 'cache hits', lambda: {
+    ('directory',): DIRECTORY.hits,
+    ('membership',): MEMBERSHIP.hits,
+    ('dedupe',): DEDUPE.hits,
+}, labels=['cache'], type='counter')
+callback('props_cache_misses_total', 'cache misses', lambda: {
+    ('directory',): DIRECTORY.misses,
+    ('membership',): MEMBERSHIP.misses,
+    ('dedupe',): DEDUPE.misses,
+}, labels=['cache'], type='counter')
+
+def to_json(obj, indent=4, sort_keys=True, compact=False):
+    '''
+    serialize obj; compact drops the indentation and separator whitespace
+    '''
+    return CODEC.dumps(obj, indent=indent, sort_keys=sort_keys, compact=compact)+'\n'
+
+async def request_json():
+    '''
+    the request body decoded with CODEC, None if it is not json
+    '''
+    data = await request.get_data()
+    try:
+        return await CODEC.decode(data)
+    except ValueError:
+        return None
+
+async def jsonify(status=200, indent=4, sort_keys=True, compact=False, **kwargs):
     '''
     async jsonify
     '''
-    response = await make_response(dumps(dict(**kwargs), indent=indent, sort_keys=sort_keys)+'\n')
+    response = await make_response(to_json(dict(**kwargs), indent=indent, sort_keys=sort_keys, compact=compact))
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
     response.headers['mimetype'] = 'application/json'
     response.status_code = status
     return response
 
+@app.before_serving
+async def startup():
+    '''
+    async startup
+    '''
+    asyncio.get_event_loop().add_signal_handler(signal.SIGHUP, CFG.invalidate)
+    await SLACK.open(CFG.BOT_USER_OAUTH_ACCESS_TOKEN)
+    await STORE.open()
+    if CFG.APP_WORKERS > 1 and not STORE.shared:
+        log.warning(f'{CFG.PROPS_STORE} store is per worker; slack retries reaching another of the {CFG.APP_WORKERS} workers are not deduped')
+    if JOURNAL:
+        recovered = await JOURNAL.open()
+        if CFG.PROPS_STORE == 'memory':
+            await STORE.incr_many(recovered) #note: the journal is the memory store's only durable copy
+    await warmup()
+    DIRECTORY.start()
+    PIPELINE.start()
+    if SOCKET:
+        SOCKET.start()
+    HEALTH.start()
+
+async def buildinfo():
+    '''
+    resolve the git-derived CFG values; undefined without git, buildinfo.json or env
+    '''
+    for key in BUILDINFO_KEYS:
+        getattr(CFG, key)
+
+async def warmup():
+    '''
+    fill the caches the first events would otherwise miss: the git-derived CFG values,
+    the directory, the configured channels' members, the props state and the slack
+    connectivity check, concurrently; a failing step is recorded, never fatal
+    '''
+    await HEALTH.warmup(
+        buildinfo=buildinfo,
+        directory=DIRECTORY.refresh,
+        membership=lambda: asyncio.gather(*[partition.members() for partition in PARTITIONS.configured()]),
+        leaderboard=lambda: LEADERBOARD.start(STORE),
+        slack=lambda: SLACK.connectivity(force=True))
+
+@app.after_serving
+async def shutdown():
+    '''
+    async shutdown
+    '''
+    await HEALTH.stop()
+    if SOCKET:
+        await SOCKET.stop()
+    await PIPELINE.stop()
+    await OUTBOX.close()
+    await DIRECTORY.stop()
+    await LEADERBOARD.stop()
+    if JOURNAL:
+        await JOURNAL.close()
+    await STORE.close()
+    await SLACK.close()
+
+USAGE = 'usage: /props-bot top [prop] [N] | /props-bot show <name>'
+
+def slash_command(text, channel=None):
+    '''
+    answer a /props-bot command from the leaderboard of channel's scope
+    '''
+    scope = PARTITIONS.scope_for(channel)
+    args = text.split()
+    if args[:1] == ['top'] and len(args) <= 3:
+        prop, count = DEFAULT_PROP, 10
+        for arg in args[1:]:
+            if arg.isdigit():
+                count = int(arg)
+            else:
+                prop = arg
+        top = LEADERBOARD.top(prop, count, scope=scope)
+        if not top:
+            return f'no {prop} yet'
+        return '\n'.join([f'top {prop}:'] + [f'{rank}. {name} => {value}' for rank, (name, value) in enumerate(top, 1)])
+    if args[:1] == ['show'] and len(args) == 2:
+        name = args[1]
+        props = LEADERBOARD.show(name, scope=scope)
+        if not props:
+            return f'{name} has no props yet'
+        return '\n'.join(f'{name}:{prop} => {value}' for prop, value in sorted(props.items()))
+    return USAGE
+
+@app.before_request
+async def before_request():
+    '''
+    async before_request
+    '''
+    g.start = time.monotonic()
+
+@app.after_request
+async def after_request(response):
+    '''
+    async after_request; records per-route latency
+    '''
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(time.monotonic() - g.start, route, request.method)
+    REQUESTS.inc(route, request.method, response.status_code)
+    return response
+
 def is_request_valid(token, team_id):
     '''
     is_request_valid
     '''
     return token == CFG.SLACK_VERIFICATION_TOKEN and team_id == CFG.SLACK_TEAM_ID
 
+def static(name, render):
+    '''
+    render a response body once and keep it as immutable bytes with a strong etag
+    '''
+    if name not in STATIC:
+        body = render().encode('utf-8')
+        STATIC[name] = body, f'"{hashlib.sha1(body).hexdigest()}"'
+    return STATIC[name]
+
+def static_response(name, render, content_type):
+    '''
+    serve a static body, answering a matching If-None-Match with 304; as the
+    header asks for, tags compare weakly so W/"etag" matches too
+    '''
+    body, etag = static(name, render)
+    tags = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+    tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+    if etag in tags or '*' in tags:
+        response = Response(b'', status=304)
+    else:
+        response = Response(body, status=200, content_type=content_type)
+    response.headers['ETag'] = etag
+    return response
+
+def render_contribute_json():
+    '''
+    render_contribute_json
+    '''
+    json = merge(CONTRIBUTE_JSON, dict(
+        repository=dict(
+            version=CFG.APP_VERSION,
+            revision=CFG.APP_REVISION)))
+    return to_json(json)
+
 @app.route('/version', methods=['GET'])
 async def version():
     '''
     async version route
     '''
-    return f'{CFG.APP_VERSION}\n', 200
+    return static_response('version', lambda: f'{CFG.APP_VERSION}\n', 'text/plain; charset=utf-8')
 
 @app.route('/contribute.json', methods=['GET'])
 async def contribute_json():
     '''
     async contribute.json route
     '''
-    json = merge(CONTRIBUTE_JSON, dict(
-        repository=dict(
-            version=CFG.APP_VERSION,
-            revision=CFG.APP_REVISION)))
-    response = await jsonify(**json), 200
-    return response
+    return static_response('contribute.json', render_contribute_json, 'application/json; charset=utf-8')
 
 @app.route('/props-bot', methods=['POST'])
+@PROFILER.profiled
 async def props_bot():
     '''
     async props_bot slash command route
     '''
-    form = await request.form.to_dict()
-    form = AttrDict(form)
-    if not is_request_valid(form.token, form.team_id):
+    form = (await request.form).to_dict()
+    if not is_request_valid(form.get('token'), form.get('team_id')):
         abort(400)
 
-    return 'wazzup playa?', 200
+    return slash_command(form.get('text', ''), form.get('channel_id')), 200
 
 @app.route('/slack/interactivity', methods=['POST'])
 async def slack_interactivity():
     '''
     async slack_interactivity route
     '''
-    json = await request.get_json(silent=True)
-    json = AttrDict(json)
+    await request_json()
     return Response('', status=200)
 
 @app.route('/slack/message-menus', methods=['POST'])
@@ -90,36 +301,144 @@ async def slack_message_menus():
     '''
     async slack_message_menus route
     '''
-    json = await request.get_json(silent=True)
-    json = AttrDict(json)
+    await request_json()
     return Response('', status=200)
 
 @app.route('/slack/events', methods=['POST'])
+@PROFILER.profiled
 async def slack_events():
     '''
-    async slack_events route
+    async slack_events route; acks immediately and leaves the work to the pipeline
     '''
-    print('*'*80)
-    json = await request.get_json(silent=True)
-    json = AttrDict(json)
+    json = await request_json()
+    if not isinstance(json, dict):
+        abort(400)
     if 'challenge' in json:
-        return json.challenge, 200
-    if json.event.channel != CFG.PROPS_BOT_CHANNEL_ID and 'text' in json.event:
-        return Response('', status=200)
-    if json.event.get('username', None) == 'props':
-        return Response('', status=200)
-
-    dbg(event=json.event)
-    slack = SlackClient(CFG.BOT_USER_OAUTH_ACCESS_TOKEN)
-    bot = PropsBot(slack, json.event)
-    name, prop, operator, operand = bot.parse()
-    dbg(name, prop, operator, operand)
-    if name in bot.members_in_channel:
-        bot.update(name, prop, operator, operand)
-    return Response('', status=200)
+        return json['challenge'], 200
+    status = await ingest(json)
+    if status == 400:
+        abort(400)
+    return Response('', status=status)
 
-async def io_background_task():
+async def ingest(json):
+    '''
+    validate, dedupe and queue one events_api payload; returns the http status
+    to answer with, whichever way the payload arrived. the local cache catches
+    retries this worker saw, the store's claim those another worker saw
     '''
-    async io_background_task
+    if not isinstance(json.get('event'), dict) or not is_request_valid(json.get('token'), json.get('team_id')):
+        return 400
+    event = Event.from_json(json['event'], event_id=json.get('event_id'))
+    event.profile = PROFILER.signed()
+    event_id = event.event_id
+    if event_id and (DEDUPE.seen(event_id) or not await STORE.claim(event_id, CFG.DEDUPE_TTL)):
+        return 200
+    if not PIPELINE.submit(event):
+        DEDUPE.forget(event_id)
+        if event_id:
+            await STORE.unclaim(event_id)
+        return 503
+    return 200
+
+async def socket_events_api(payload):
     '''
-    raise NotImplementedError
+    socket mode events_api envelope; left unacked when the queue is full so slack redelivers
+    '''
+    if await ingest(payload) == 503:
+        return None
+    return {}
+
+async def socket_slash_commands(payload):
+    '''
+    socket mode slash_commands envelope; the reply rides on the ack
+    '''
+    if not is_request_valid(payload.get('token'), payload.get('team_id')):
+        return {}
+    return dict(text=slash_command(payload.get('text', ''), payload.get('channel_id')))
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    '''
+    async prometheus metrics route
+    '''
+    return Response(REGISTRY.render(), status=200, content_type=CONTENT_TYPE)
+
+@app.route('/healthz', methods=['GET'])
+async def healthz():
+    '''
+    async liveness route; answers while the event loop runs
+    '''
+    return await jsonify(alive=True, uptime=HEALTH.uptime)
+
+@app.route('/readyz', methods=['GET'])
+async def readyz():
+    '''
+    async readiness route; 503 until warm and while a cached check fails
+    '''
+    ready, checks = HEALTH.ready()
+    return await jsonify(status=200 if ready else 503, ready=ready, checks=checks, warmup=HEALTH.steps)
+
+@app.route('/stats', methods=['GET'])
+async def stats():
+    '''
+    async stats route
+    '''
+    return await jsonify(
+        queue=PIPELINE.stats,
+        dedupe=DEDUPE.stats,
+        partitions={partition.channel: partition.scope for partition in PARTITIONS})
+
+@PROFILER.profiled
+async def io_background_task(event):
+    '''
+    async io_background_task; handles one queued slack event
+    '''
+    if event.type in UserDirectory.events:
+        DIRECTORY.apply(event)
+        return
+    if event.type in ChannelMembership.events:
+        MEMBERSHIP.apply(event)
+        return
+    partition = PARTITIONS.get(event.channel)
+    if partition is None:
+        return
+    if event.username == 'props':
+        return
+
+    dbg(event=event)
+    bot = PropsBot(
+        SLACK,
+        event,
+        directory=DIRECTORY,
+        membership=MEMBERSHIP,
+        store=STORE,
+        outbox=OUTBOX,
+        leaderboard=LEADERBOARD,
+        journal=JOURNAL,
+        partition=partition)
+    updates = await bot.only_members(bot.parse_all())
+    dbg(updates)
+    if updates:
+        await bot.update_many(updates)
+
+PIPELINE = EventPipeline(
+    io_background_task,
+    maxsize=CFG.EVENT_QUEUE_SIZE,
+    workers=CFG.EVENT_WORKERS,
+    timeout=CFG.EVENT_DRAIN_TIMEOUT,
+    partition=lambda event: event.channel,
+    share=CFG.EVENT_PARTITION_SHARE)
+SOCKET = SocketMode(
+    SLACK,
+    CFG.SLACK_APP_TOKEN,
+    dict(events_api=socket_events_api, slash_commands=socket_slash_commands),
+    heartbeat=CFG.SOCKET_HEARTBEAT) if CFG.INGEST_MODE == 'socket' else None
+HEALTH = Health(
+    checks=dict(
+        directory=lambda: DIRECTORY.refreshed is not None,
+        pipeline=lambda: bool(PIPELINE.tasks),
+        socket=lambda: SOCKET.connected if SOCKET else True),
+    reports=dict(slack=lambda: SLACK.connected),
+    probes=dict(slack=SLACK.connectivity),
+    interval=CFG.HEALTH_INTERVAL,
+    timeout=CFG.WARMUP_TIMEOUT)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+membership
+'''
+
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+class ChannelsInfoError(Exception):
+    '''
+    ChannelsInfoError
+    '''
+    def __init__(self, json):
+        '''
+        init
+        '''
+        msg = f'channels.info error; json = {json}'
+        super(ChannelsInfoError, self).__init__(msg)
+
+class ChannelMembership:
+    '''
+    per-channel sets of member ids, loaded once and kept current from events;
+    events arriving while a channel loads are replayed onto the loaded set
+    '''
+    events = ('member_joined_channel', 'member_left_channel')
+
+    def __init__(self, slack=None):
+        '''
+        init
+        '''
+        self.slack = slack
+        self.channels = {}
+        self.loading = {}
+        self.arrived = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, channel):
+        '''
+        contains
+        '''
+        return channel in self.channels
+
+    async def fetch(self, channel):
+        '''
+        fetch the member ids of channel from channels.info
+        '''
+        json = await self.slack.api_call('channels.info', channel=channel)
+        if 'channel' in json:
+            return json['channel'].get('members', [])
+        raise ChannelsInfoError(json)
+
+    async def load(self, channel):
+        '''
+        (re)load the member set of channel
+        '''
+        self.arrived.setdefault(channel, [])
+        try:
+            members = set(await self.fetch(channel))
+        finally:
+            arrived = self.arrived.pop(channel)
+        for event in arrived:
+            self.change(members, event)
+        self.channels[channel] = members
+        log.info(f'membership loaded {len(members)} members for {channel}; replayed {len(arrived)} events')
+        return members
+
+    async def members(self, channel):
+        '''
+        member id set of channel; concurrent first callers share one load
+        '''
+        members = self.channels.get(channel)
+        if members is not None:
+            self.hits += 1
+            return members
+        self.misses += 1
+        future = self.loading.get(channel)
+        if future is None:
+            self.arrived[channel] = []
+            future = self.loading[channel] = asyncio.ensure_future(self.load(channel))
+            future.add_done_callback(lambda _: self.done(channel))
+        return await asyncio.shield(future)
+
+    def done(self, channel):
+        '''
+        forget the finished load of channel, even one cancelled before it started
+        '''
+        self.loading.pop(channel, None)
+        self.arrived.pop(channel, None)
+
+    def apply(self, event):
+        '''
+        apply a member_joined_channel or member_left_channel event
+        '''
+        if event.channel in self.arrived:
+            self.arrived[event.channel].append(event)
+        members = self.channels.get(event.channel)
+        if members is not None:
+            self.change(members, event)
+
+    @staticmethod
+    def change(members, event):
+        '''
+        add or discard the event's user
+        '''
+        if event.type == 'member_joined_channel':
+            members.add(event.user)
+        else:
+            members.discard(event.user)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+metrics
+'''
+
+from bisect import bisect_left
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def escape(value):
+    '''
+    escape a label value for the prometheus text format
+    '''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def labelset(names, values, extra=None):
+    '''
+    format {name="value",...} or '' when there are no labels
+    '''
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+class Metric:
+    '''
+    base metric; label values are passed positionally in the order of labels
+    '''
+    type = 'untyped'
+
+    def __init__(self, name, doc, labels=()):
+        '''
+        init
+        '''
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+
+    def samples(self):
+        '''
+        yield (suffix, label values, extra labels, value)
+        '''
+        raise NotImplementedError
+
+    def render(self):
+        '''
+        render in the prometheus text format
+        '''
+        lines = [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} {self.type}']
+        for suffix, values, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{labelset(self.labels, values, extra)} {value}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    '''
+    monotonically increasing counter
+    '''
+    type = 'counter'
+
+    def __init__(self, name, doc, labels=()):
+        '''
+        init
+        '''
+        super(Counter, self).__init__(name, doc, labels)
+        self.values = {}
+
+    def inc(self, *values, amount=1):
+        '''
+        inc
+        '''
+        self.values[values] = self.values.get(values, 0) + amount
+
+    def samples(self):
+        '''
+        samples
+        '''
+        for values, value in sorted(self.values.items()):
+            yield '', values, None, value
+
+class Histogram(Metric):
+    '''
+    cumulative histogram over fixed buckets
+    '''
+    type = 'histogram'
+
+    def __init__(self, name, doc, labels=(), buckets=BUCKETS):
+        '''
+        init
+        '''
+        super(Histogram, self).__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, *values):
+        '''
+        observe
+        '''
+        series = self.values.get(values)
+        if series is None:
+            series = self.values[values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        '''
+        samples
+        '''
+        for values, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                yield '_bucket', values, [('le', bound)], cumulative
+            yield '_sum', values, None, total
+            yield '_count', values, None, count
+
+class Callback(Metric):
+    '''
+    metric read from func at scrape time; func returns a number, or a dict of
+    {label values: number} when the metric has labels
+    '''
+    def __init__(self, name, doc, func, labels=(), type='gauge'): #pylint: disable=redefined-builtin,too-many-arguments
+        '''
+        init
+        '''
+        super(Callback, self).__init__(name, doc, labels)
+        self.func = func
+        self.type = type
+
+    def samples(self):
+        '''
+        samples
+        '''
+        result = self.func()
+        if not self.labels:
+            yield '', (), None, result
+            return
+        for values, value in sorted(result.items()):
+            yield '', values, None, value
+
+class Registry:
+    '''
+    registry
+    '''
+    def __init__(self):
+        '''
+        init
+        '''
+        self.metrics = []
+
+    def register(self, metric):
+        '''
+        register
+        '''
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        '''
+        render every registered metric
+        '''
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+REGISTRY = Registry()
+
+def counter(name, doc, labels=()):
+    '''
+    register a Counter
+    '''
+    return REGISTRY.register(Counter(name, doc, labels))
+
+def histogram(name, doc, labels=(), buckets=BUCKETS):
+    '''
+    register a Histogram
+    '''
+    return REGISTRY.register(Histogram(name, doc, labels, buckets))
+
+def callback(name, doc, func, labels=(), type='gauge'): #pylint: disable=redefined-builtin
+    '''
+    register a Callback
+    '''
+    return REGISTRY.register(Callback(name, doc, func, labels, type))
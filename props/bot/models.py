@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+models
+'''
+
+class Member:
+    '''
+    a workspace user, as much of it as the bot reads
+    '''
+    __slots__ = ('id', 'name', 'deleted')
+
+    def __init__(self, id, name, deleted=False): #pylint: disable=redefined-builtin
+        '''
+        init
+        '''
+        self.id = id #pylint: disable=invalid-name
+        self.name = name
+        self.deleted = deleted
+
+    def __repr__(self):
+        '''
+        repr
+        '''
+        return f'Member(id={self.id!r}, name={self.name!r}, deleted={self.deleted!r})'
+
+    def __eq__(self, other):
+        '''
+        eq
+        '''
+        if not isinstance(other, Member):
+            return NotImplemented
+        return (self.id, self.name, self.deleted) == (other.id, other.name, other.deleted)
+
+    @classmethod
+    def from_json(cls, json):
+        '''
+        member from a users.list or event user object
+        '''
+        return cls(json['id'], json['name'], bool(json.get('deleted')))
+
+class Event:
+    '''
+    a slack event, as much of it as the bot reads; user is a member id, or a
+    Member for team_join and user_change; profile carries a signed profiling
+    request from the ack to the worker that handles the event
+    '''
+    __slots__ = ('type', 'channel', 'user', 'username', 'text', 'ts', 'event_id', 'profile')
+
+    def __init__(self, type, channel=None, user=None, username=None, text=None, ts=None, event_id=None, profile=False): #pylint: disable=redefined-builtin,too-many-arguments
+        '''
+        init
+        '''
+        self.type = type
+        self.channel = channel
+        self.user = user
+        self.username = username
+        self.text = text
+        self.ts = ts #pylint: disable=invalid-name
+        self.event_id = event_id
+        self.profile = profile
+
+    def __repr__(self):
+        '''
+        repr
+        '''
+        fields = ', '.join(f'{slot}={getattr(self, slot)!r}' for slot in Event.__slots__)
+        return f'Event({fields})'
+
+    @classmethod
+    def from_json(cls, json, event_id=None):
+        '''
+        event from the event object of an events_api payload
+        '''
+        user = json.get('user')
+        if isinstance(user, dict):
+            user = Member.from_json(user)
+        return cls(
+            json.get('type'),
+            channel=json.get('channel'),
+            user=user,
+            username=json.get('username'),
+            text=json.get('text'),
+            ts=json.get('ts'),
+            event_id=event_id or json.get('event_id') or json.get('client_msg_id'))
+
+class Channel:
+    '''
+    a channel from channels.list or channels.info
+    '''
+    __slots__ = ('id', 'name', 'members')
+
+    def __init__(self, id, name=None, members=()): #pylint: disable=redefined-builtin
+        '''
+        init
+        '''
+        self.id = id #pylint: disable=invalid-name
+        self.name = name
+        self.members = members
+
+    def __repr__(self):
+        '''
+        repr
+        '''
+        return f'Channel(id={self.id!r}, name={self.name!r}, members={len(self.members)})'
+
+    @classmethod
+    def from_json(cls, json):
+        '''
+        channel from a channel object
+        '''
+        return cls(json['id'], name=json.get('name'), members=tuple(json.get('members', ())))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+outbox
+'''
+
+import time
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+class TokenBucket:
+    '''
+    token bucket refilled at rate tokens per second up to burst tokens
+    '''
+    def __init__(self, rate=1.0, burst=1):
+        '''
+        init
+        '''
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        '''
+        refill
+        '''
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        '''
+        take a token and return 0, or return the seconds until one is available
+        '''
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def penalize(self, seconds):
+        '''
+        empty the bucket so the next token is seconds away
+        '''
+        self.refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    async def acquire(self):
+        '''
+        wait for a token
+        '''
+        while True:
+            delay = self.take()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+class Outbox:
+    '''
+    per-channel outbound queue that merges messages posted within window seconds
+    into one chat.postMessage and paces posts with a token bucket per channel
+    '''
+    def __init__(self, slack, rate=1.0, burst=1, window=0.5, separator='\n', maxlines=50, timeout=10): #pylint: disable=too-many-arguments
+        '''
+        init
+        '''
+        self.slack = slack
+        self.timeout = timeout
+        self.maxlines = maxlines
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.separator = separator
+        self.buckets = {}
+        self.pending = {}
+        self.tasks = {}
+
+    def post(self, channel, text):
+        '''
+        queue the lines of text for channel
+        '''
+        self.pending.setdefault(channel, []).extend(text.split(self.separator))
+        if channel not in self.tasks:
+            self.tasks[channel] = asyncio.ensure_future(self.sender(channel))
+
+    async def sender(self, channel):
+        '''
+        post everything queued for channel, one merged message of up to maxlines per token
+        '''
+        bucket = self.buckets.setdefault(channel, TokenBucket(self.rate, self.burst))
+        try:
+            await asyncio.sleep(self.window)
+            while self.pending.get(channel):
+                await bucket.acquire()
+                queued = self.pending.pop(channel)
+                lines, rest = queued[:self.maxlines], queued[self.maxlines:]
+                if rest:
+                    self.pending[channel] = rest
+                try:
+                    json = await self.slack.api_call(
+                        'chat.postMessage',
+                        channel=channel,
+                        text=self.separator.join(lines))
+                except Exception as ex: #pylint: disable=broad-except
+                    log.error(f'chat.postMessage to {channel} failed; dropping {len(lines)} lines: {ex}')
+                    continue
+                if json.get('error') == 'ratelimited':
+                    self.pending[channel] = lines + self.pending.get(channel, [])
+                    bucket.penalize(json.get('retry_after', 1))
+                elif not json.get('ok'):
+                    log.error(f'chat.postMessage to {channel} failed; dropping {len(lines)} lines: {json.get("error")}')
+        finally:
+            self.tasks.pop(channel, None)
+
+    async def close(self):
+        '''
+        wait up to timeout seconds for every queued message to be posted, then drop the rest
+        '''
+        tasks = list(self.tasks.values())
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), self.timeout)
+        except asyncio.TimeoutError:
+            for channel, lines in self.pending.items():
+                log.warning(f'outbox not drained; dropping {len(lines)} lines to {channel}')
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.pending = {}
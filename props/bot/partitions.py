@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+partitions
+'''
+
+import logging
+
+log = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = 'global'
+CHANNEL_SCOPE = 'channel'
+ANY_CHANNEL = '*'
+
+def parse_channels(spec, namespace=GLOBAL_SCOPE):
+    '''
+    parse "C1,C2:channel,C3:eng" into {channel: namespace}; a bare channel gets namespace,
+    channel means a namespace of its own and * matches every channel
+    '''
+    settings = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if item:
+            channel, _, name = item.partition(':')
+            settings[channel.strip()] = name.strip() or namespace
+    return settings
+
+class Partition:
+    '''
+    the state of one active channel: its props scope and, loaded on first use, its members
+    '''
+    __slots__ = ('channel', 'scope', 'membership')
+
+    def __init__(self, channel, scope, membership=None):
+        '''
+        init
+        '''
+        self.channel = channel
+        self.scope = scope
+        self.membership = membership
+
+    def __repr__(self):
+        '''
+        repr
+        '''
+        return f'Partition(channel={self.channel!r}, scope={self.scope!r})'
+
+    async def members(self):
+        '''
+        member id set of the channel
+        '''
+        return await self.membership.members(self.channel)
+
+class Partitions:
+    '''
+    the channels the bot is active in, each partitioned into its own props scope
+    or sharing a named one; partitions are created when their channel first speaks
+    '''
+    def __init__(self, settings, membership=None):
+        '''
+        init
+        '''
+        self.settings = settings
+        self.membership = membership
+        self.partitions = {}
+
+    def __len__(self):
+        '''
+        len
+        '''
+        return len(self.partitions)
+
+    def __iter__(self):
+        '''
+        iter
+        '''
+        return iter(list(self.partitions.values()))
+
+    @property
+    def scopes(self):
+        '''
+        scopes of every partition created so far
+        '''
+        return sorted(set(partition.scope for partition in self.partitions.values()))
+
+    def configured(self):
+        '''
+        partitions of every explicitly listed channel, created now
+        '''
+        return [self.get(channel) for channel in self.settings if channel != ANY_CHANNEL]
+
+    def get(self, channel):
+        '''
+        the partition of channel, or None when the bot is not active there
+        '''
+        partition = self.partitions.get(channel)
+        if partition is not None:
+            return partition
+        namespace = self.settings.get(channel, self.settings.get(ANY_CHANNEL))
+        if namespace is None or not channel:
+            return None
+        scope = channel if namespace == CHANNEL_SCOPE else namespace
+        partition = self.partitions[channel] = Partition(channel, scope, self.membership)
+        log.info(f'partition created; {partition}')
+        return partition
+
+    def scope_for(self, channel):
+        '''
+        props scope of channel; channels the bot is not active in read the global scope
+        '''
+        partition = self.get(channel)
+        return partition.scope if partition else GLOBAL_SCOPE
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+pipeline
+'''
+
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+class EventPipeline:
+    '''
+    bounded event queue drained by a pool of asyncio workers; when partition is
+    given, the events of any one partition may fill at most share of the queue so
+    that a hot partition cannot starve the others
+    '''
+    def __init__(self, handler, maxsize=1000, workers=4, timeout=10, partition=None, share=1.0): #pylint: disable=too-many-arguments
+        '''
+        init
+        '''
+        self.handler = handler
+        self.maxsize = maxsize
+        self.workers = workers
+        self.timeout = timeout
+        self.partition = partition
+        self.limit = max(1, int(maxsize * share))
+        self.queued = {}
+        self.queue = None
+        self.tasks = []
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def depth(self):
+        '''
+        number of events waiting for a worker
+        '''
+        return self.queue.qsize() if self.queue else 0
+
+    @property
+    def stats(self):
+        '''
+        stats
+        '''
+        return dict(
+            depth=self.depth,
+            maxsize=self.maxsize,
+            workers=len(self.tasks),
+            processed=self.processed,
+            failed=self.failed,
+            dropped=self.dropped)
+
+    def submit(self, event):
+        '''
+        enqueue event without waiting; False if the queue or the event's share of it is full
+        '''
+        key = self.partition(event) if self.partition else None
+        if self.queued.get(key, 0) >= self.limit:
+            self.dropped += 1
+            log.warning(f'event queue share full; partition = {key}')
+            return False
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.warning(f'event queue full; depth = {self.depth}')
+            return False
+        self.queued[key] = self.queued.get(key, 0) + 1
+        return True
+
+    def done(self, event):
+        '''
+        release the queue share held by event
+        '''
+        key = self.partition(event) if self.partition else None
+        count = self.queued.get(key, 0) - 1
+        if count > 0:
+            self.queued[key] = count
+        else:
+            self.queued.pop(key, None)
+
+    async def worker(self, number):
+        '''
+        handle queued events until cancelled
+        '''
+        while True:
+            event = await self.queue.get()
+            try:
+                await self.handler(event)
+                self.processed += 1
+            except Exception as ex: #pylint: disable=broad-except
+                self.failed += 1
+                log.exception(f'worker {number} failed handling event: {ex}')
+            finally:
+                self.done(event)
+                self.queue.task_done()
+
+    def start(self):
+        '''
+        create the queue and start the workers
+        '''
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self.tasks = [asyncio.ensure_future(self.worker(number)) for number in range(self.workers)]
+
+    async def stop(self):
+        '''
+        wait up to timeout seconds for queued events, then stop the workers
+        '''
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), self.timeout)
+        except asyncio.TimeoutError:
+            log.warning(f'event queue not drained; abandoning {self.depth} events')
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+profiling
+'''
+
+import os
+import sys
+import hmac
+import glob
+import time
+import random
+import pstats
+import hashlib
+import logging
+import cProfile
+import functools
+
+from quart import has_request_context, request
+
+log = logging.getLogger(__name__)
+
+HEADER = 'X-Props-Profile'
+
+def sign(secret, timestamp):
+    '''
+    the X-Props-Profile header value for timestamp: "<timestamp>:<hex hmac-sha256>"
+    '''
+    digest = hmac.new(secret.encode('utf-8'), str(timestamp).encode('utf-8'), hashlib.sha256).hexdigest()
+    return f'{timestamp}:{digest}'
+
+class Profiler:
+    '''
+    samples coroutine calls under cProfile and dumps one pstats file per call;
+    the profile covers whatever else runs on the event loop meanwhile
+    '''
+    def __init__(self, path, rate=0.0, secret='', window=300):
+        '''
+        init
+        '''
+        self.path = path
+        self.rate = rate
+        self.secret = secret
+        self.window = window
+        self.active = False
+
+    @property
+    def enabled(self):
+        '''
+        enabled
+        '''
+        return self.rate > 0 or bool(self.secret)
+
+    def signed(self):
+        '''
+        True if the current request carries a fresh, correctly signed profile header
+        '''
+        if not self.secret or not has_request_context():
+            return False
+        value = request.headers.get(HEADER, '')
+        timestamp = value.split(':', 1)[0]
+        if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > self.window:
+            return False
+        return hmac.compare_digest(value, sign(self.secret, timestamp))
+
+    def wants(self, *args):
+        '''
+        sampled at rate, or asked for by a signed request or an argument flagged
+        with profile, such as an event queued by a signed request
+        '''
+        if self.active:
+            return False
+        return random.random() < self.rate or self.signed() or any(getattr(arg, 'profile', False) for arg in args)
+
+    def dump(self, profile, name):
+        '''
+        dump
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, f'{name}-{os.getpid()}-{int(time.time() * 1000)}.pstats')
+        profile.dump_stats(filename)
+        log.info(f'profile written to {filename}')
+
+    def profiled(self, func):
+        '''
+        decorate a coroutine function; returns func itself when profiling is disabled
+        '''
+        if not self.enabled:
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            '''
+            wrapper
+            '''
+            if not self.wants(*args):
+                return await func(*args, **kwargs)
+            self.active = True
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profile.disable()
+                self.active = False
+                self.dump(profile, func.__name__)
+        return wrapper
+
+def aggregate(path, sort='cumulative', limit=40):
+    '''
+    print the combined stats of every pstats file in path
+    '''
+    filenames = sorted(glob.glob(os.path.join(path, '*.pstats')))
+    if not filenames:
+        print(f'no profiles in {path}')
+        return
+    stats = pstats.Stats(*filenames)
+    print(f'{len(filenames)} profiles in {path}')
+    stats.sort_stats(sort).print_stats(limit)
+
+if __name__ == '__main__':
+    aggregate(*sys.argv[1:2])
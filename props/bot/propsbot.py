@@ -6,12 +6,17 @@ propsbot
 
 import re
 
-from attrdict import AttrDict
-
 from utils.dbg import dbg
+from models import Channel
+from partitions import GLOBAL_SCOPE
+from directory import MembersListError #pylint: disable=unused-import
+from membership import ChannelsInfoError
+
+DEFAULT_PROP = 'props'
 
+## operands are capped at three digits; a longer one leaves its expression unparsed
 #pylint: disable=line-too-long
-parse_regex = re.compile(r'(?P<name>[A-Za-z0-9_-]+)(:(?P<prop>[A-Za-z0-9_-]+))?(?P<operator>\+\+|--|\+=|-=)?(?P<operand>[0-9])?')
+parse_regex = re.compile(r'(?<![A-Za-z0-9_:-])(?P<name>[A-Za-z0-9_-]+)(:(?P<prop>[A-Za-z0-9_-]+))?(?P<operator>\+\+|--|\+=|-=)(?P<operand>(?<==)[0-9]{1,3}(?![0-9]))?')
 
 class EventTextError(Exception):
     '''
@@ -46,64 +51,50 @@ class ChannelsListError(Exception):
         msg = f'channels.list error; json = {json}'
         super(ChannelsListError, self).__init__(msg)
 
-class ChannelsInfoError(Exception):
-    '''
-    ChannelsInfoError
-    '''
-    def __init__(self, json):
-        '''
-        init
-        '''
-        msg = f'channels.info error; json = {json}'
-        super(ChannelsInfoError, self).__init__(msg)
-
-class MembersListError(Exception):
-    '''
-    MembersListError
-    '''
-    def __init__(self, json):
-        '''
-        init
-        '''
-        msg = f'users.list error; json = {json}'
-        super(MembersListError, self).__init__(msg)
-
 class PropsBot:
     '''
     PropsBot
     '''
-    props = {}
-
     operators = {
-        '++': lambda x, y: x + 1,
-        '--': lambda x, y: x - 1,
-        '+=': lambda x, y: x + int(y),
-        '-=': lambda x, y: x - int(y),
+        '++': lambda y: 1,
+        '--': lambda y: -1,
+        '+=': lambda y: int(y),
+        '-=': lambda y: -int(y),
     }
 
-    def __init__(self, slack, event):
+    def __init__(self, slack, event, directory=None, membership=None, store=None, outbox=None, leaderboard=None, journal=None, partition=None): #pylint: disable=too-many-arguments
         '''
         init
         '''
         self.slack = slack
         self.event = event
+        self.partition = partition
+        self.directory = directory
+        self.membership = membership
+        self.store = store
+        self.outbox = outbox
+        self.leaderboard = leaderboard
+        self.journal = journal
+
+    async def has_connectivity(self):
+        '''
+        has_connectivity; answered from the client's cached auth.test
+        '''
+        return await self.slack.connectivity()
 
     @property
-    def has_connectivity(self):
+    def scope(self):
         '''
-        has_connectivity
+        props scope of the event's channel
         '''
-        api_test = self.slack.api_call('api.test')
-        auth_test = self.slack.api_call('auth.test')
-        dbg(api_test, auth_test)
-        return True
+        return self.partition.scope if self.partition is not None else GLOBAL_SCOPE
 
     @property
     def text(self):
         '''
         text
         '''
-        if 'text' in self.event:
+        if self.event.text is not None:
             return self.event.text
         raise EventTextError(self.event)
 
@@ -112,73 +103,108 @@ class PropsBot:
         '''
         channel
         '''
-        if 'channel' in self.event:
+        if self.event.channel is not None:
             return self.event.channel
         raise EventChannelError(self.event)
 
-    @property
-    def channels(self):
+    async def channels(self):
         '''
         channels
         '''
-        json = self.slack.api_call('channels.list')
+        json = await self.slack.api_call('channels.list')
         if 'channels' in json:
-            return [AttrDict(channel) for channel in json['channels']]
+            return [Channel.from_json(channel) for channel in json['channels']]
         raise ChannelsListError(json)
 
-    @property
-    def channels_info(self):
+    async def channels_info(self):
         '''
         channels_info
         '''
-        json = self.slack.api_call('channels.info', channel=self.channel)
+        json = await self.slack.api_call('channels.info', channel=self.channel)
         if 'channel' in json:
-            return AttrDict(json['channel'])
+            return Channel.from_json(json['channel'])
         raise ChannelsInfoError(json)
 
-    @property
-    def members(self):
+    async def members_in_channel(self):
         '''
-        members
+        members_in_channel
         '''
-        json = self.slack.api_call('users.list')
-        if 'members' in json:
-            return [AttrDict(member) for member in json['members']]
-        raise MembersListError(json)
+        if self.partition is not None:
+            return await self.partition.members()
+        return await self.membership.members(self.channel)
 
-    @property
-    def members_in_channel(self):
+    async def is_member(self, name):
         '''
-        members_in_channel
+        is_member
         '''
-        return [member.name for member in self.members if member.id in self.channels_info.members]
+        return self.directory.id_for(name) in await self.members_in_channel()
+
+    async def only_members(self, updates):
+        '''
+        keep the updates whose name is a member of the channel
+        '''
+        members = await self.members_in_channel()
+        return [update for update in updates if self.directory.id_for(update[0]) in members]
 
     def parse(self, text=None):
         '''
         parse
         '''
-        match = parse_regex.search(text if text else self.text)
-        if match:
-            d = match.groupdict()
-            return d['name'], d['prop'], d['operator'], d['operand']
+        updates = self.parse_all(text)
+        if updates:
+            return updates[0]
         return [None] * 4
 
-    def send(self, message, channel=None):
+    def parse_all(self, text=None):
+        '''
+        parse every valid name[:prop]op[operand] expression in one scan
+        '''
+        updates = []
+        for match in parse_regex.finditer(text if text else self.text):
+            d = match.groupdict()
+            if d['operator'] in ('+=', '-=') and d['operand'] is None:
+                continue
+            updates.append((d['name'], d['prop'], d['operator'], d['operand']))
+        return updates
+
+    async def send(self, message, channel=None):
         '''
         send
         '''
-        self.slack.api_call('chat.postMessage', channel=channel if channel else self.channel, text=message)
+        if self.outbox is not None:
+            self.outbox.post(channel if channel else self.channel, message)
+            return
+        await self.slack.api_call('chat.postMessage', channel=channel if channel else self.channel, text=message)
 
-    def update(self, name, prop, operator, operand):
+    async def update(self, name, prop, operator, operand):
         '''
         update
         '''
         dbg()
         if operator:
-            member_props = PropsBot.props.pop(name, {})
-            prop_value = member_props.pop(prop, 0)
-            member_props[prop] = PropsBot.operators[operator](prop_value, operand)
-            PropsBot.props[name] = member_props
-        value = PropsBot.props.get(name, {}).get(prop, 0)
+            await self.update_many([(name, prop, operator, operand)])
+            return
+        prop = prop or DEFAULT_PROP
+        value = await self.store.get((self.scope, name, prop))
         message = f'{name}:{prop} => {value}'
-        self.send(message)
+        await self.send(message)
+
+    async def update_many(self, updates):
+        '''
+        apply updates as one batched store increment and send one combined reply;
+        updates are journaled only once the store has applied them
+        '''
+        deltas, records = {}, []
+        for name, prop, operator, operand in updates:
+            key = (self.scope, name, prop or DEFAULT_PROP)
+            delta = PropsBot.operators[operator](operand)
+            deltas[key] = deltas.get(key, 0) + delta
+            records.append((self.event.user, key, operator, operand, delta, self.event.event_id))
+        values = await self.store.incr_many(deltas)
+        if self.journal is not None:
+            for record in records:
+                self.journal.append(*record)
+        if self.leaderboard is not None:
+            self.leaderboard.update(values)
+        message = '\n'.join(f'{name}:{prop} => {values[scope, name, prop]}' for scope, name, prop in deltas)
+        await self.send(message)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+slackapi
+'''
+
+import time
+import logging
+import aiohttp
+
+from codec import JSONCodec
+from metrics import counter, histogram
+
+log = logging.getLogger(__name__)
+
+API_CALLS = counter('props_slack_api_calls_total', 'slack web api calls by method and outcome', ['method', 'status'])
+API_SECONDS = histogram('props_slack_api_seconds', 'slack web api call latency', ['method'])
+API_RATELIMITED = counter('props_slack_api_ratelimited_total', 'slack web api calls answered with 429', ['method'])
+
+SLACK_API_URL = 'https://slack.com/api'
+
+class NoTokenError(Exception):
+    '''
+    NoTokenError
+    '''
+    def __init__(self):
+        '''
+        init
+        '''
+        msg = 'no slack api token error'
+        super(NoTokenError, self).__init__(msg)
+
+class SlackAPI:
+    '''
+    asyncio slack web api client sharing one pooled keep-alive session
+    '''
+    def __init__(self, token=None, url=SLACK_API_URL, limit=10, keepalive=30, timeout=10, codec=None, ttl=60): #pylint: disable=too-many-arguments
+        '''
+        init
+        '''
+        self.token = token
+        self.url = url
+        self.limit = limit
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.codec = codec or JSONCodec()
+        self.ttl = ttl
+        self.identity = None
+        self.checked = None
+        self.session = None
+
+    @property
+    def connected(self):
+        '''
+        outcome of the last auth.test; never calls slack
+        '''
+        return self.identity is not None
+
+    async def connectivity(self, force=False):
+        '''
+        True if auth.test succeeds; the outcome is reused for ttl seconds unless forced
+        '''
+        if force or self.checked is None or time.monotonic() - self.checked >= self.ttl:
+            try:
+                json = await self.api_call('auth.test')
+            except Exception as ex: #pylint: disable=broad-except
+                log.warning(f'auth.test failed: {ex}')
+                json = {}
+            self.identity = json if json.get('ok') else None
+            self.checked = time.monotonic()
+        return self.connected
+
+    async def open(self, token=None):
+        '''
+        open the pooled session; raises NoTokenError without a token
+        '''
+        if token:
+            self.token = token
+        if not self.token:
+            raise NoTokenError
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=self.keepalive)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Authorization': f'Bearer {self.token}'})
+
+    async def close(self):
+        '''
+        close the pooled session
+        '''
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def api_call(self, method, headers=None, **kwargs):
+        '''
+        call a web api method; rate limiting is reported as error=ratelimited with retry_after;
+        headers override the session's, e.g. to authorize with another token
+        '''
+        if self.session is None:
+            await self.open()
+        data = {key: value for key, value in kwargs.items() if value is not None}
+        start, status = time.monotonic(), 'exception'
+        try:
+            async with self.session.post(f'{self.url}/{method}', data=data, headers=headers) as response:
+                if response.status == 429:
+                    status = 'ratelimited'
+                    API_RATELIMITED.inc(method)
+                    retry_after = int(response.headers.get('Retry-After', 1))
+                    log.warning(f'{method} ratelimited; retry_after = {retry_after}')
+                    return dict(ok=False, error='ratelimited', retry_after=retry_after)
+                json = await self.codec.decode(await response.read())
+                status = 'ok' if json.get('ok') else 'error'
+                return json
+        finally:
+            API_SECONDS.observe(time.monotonic() - start, method)
+            API_CALLS.inc(method, status)
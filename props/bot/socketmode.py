@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+socketmode
+'''
+
+import asyncio
+import logging
+import aiohttp
+
+from metrics import counter
+
+log = logging.getLogger(__name__)
+
+ENVELOPES = counter('props_socket_envelopes_total', 'socket mode envelopes received by type', ['type'])
+RECONNECTS = counter('props_socket_reconnects_total', 'socket mode reconnects by reason', ['reason'])
+
+class ConnectionsOpenError(Exception):
+    '''
+    ConnectionsOpenError
+    '''
+    def __init__(self, json):
+        '''
+        init
+        '''
+        msg = f'apps.connections.open error; json = {json}'
+        super(ConnectionsOpenError, self).__init__(msg)
+
+class SocketMode:
+    '''
+    slack socket mode client: keeps one websocket open, acks every envelope
+    in-band and hands its payload to the handler registered for its type;
+    a handler returns the response payload to ack with ({} for a bare ack)
+    or None to leave the envelope unacked so that slack redelivers it
+    '''
+    def __init__(self, slack, token, handlers, heartbeat=30, backoff=1, maxbackoff=60): #pylint: disable=too-many-arguments
+        '''
+        init
+        '''
+        self.slack = slack
+        self.token = token
+        self.handlers = handlers
+        self.heartbeat = heartbeat
+        self.backoff = backoff
+        self.maxbackoff = maxbackoff
+        self.connected = False
+        self.task = None
+
+    async def connect(self):
+        '''
+        open a websocket url with the app-level token
+        '''
+        json = await self.slack.api_call('apps.connections.open', headers={'Authorization': f'Bearer {self.token}'})
+        if not json.get('ok') or 'url' not in json:
+            raise ConnectionsOpenError(json)
+        return await self.slack.session.ws_connect(json['url'], heartbeat=self.heartbeat)
+
+    async def dispatch(self, ws, envelope):
+        '''
+        run the handler for one envelope and ack it
+        '''
+        kind = envelope.get('type')
+        ENVELOPES.inc(kind)
+        if kind == 'hello':
+            log.info('socket mode connected')
+            return True
+        if kind == 'disconnect':
+            log.info(f'socket mode disconnect requested; reason = {envelope.get("reason")}')
+            RECONNECTS.inc(envelope.get('reason', 'disconnect'))
+            return False
+        handler = self.handlers.get(kind)
+        envelope_id = envelope.get('envelope_id')
+        if handler is None or envelope_id is None:
+            log.warning(f'socket mode envelope ignored; type = {kind}')
+            return True
+        response = await handler(envelope.get('payload') or {})
+        if response is not None:
+            ack = dict(envelope_id=envelope_id)
+            if response:
+                ack['payload'] = response
+            await ws.send_json(ack, dumps=lambda obj: self.slack.codec.dumps(obj, compact=True))
+        return True
+
+    async def receive(self, ws):
+        '''
+        dispatch envelopes until the socket closes or slack asks for a reconnect
+        '''
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            try:
+                envelope = self.slack.codec.loads(message.data)
+            except ValueError:
+                log.warning(f'socket mode message is not json; data = {message.data[:200]}')
+                continue
+            if not await self.dispatch(ws, envelope):
+                break
+
+    async def run(self):
+        '''
+        stay connected until cancelled, backing off between failed attempts
+        '''
+        delay = self.backoff
+        while True:
+            try:
+                ws = await self.connect()
+            except (ConnectionsOpenError, aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                log.error(f'socket mode connect failed: {ex}')
+                RECONNECTS.inc('error')
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.maxbackoff)
+                continue
+            delay = self.backoff
+            self.connected = True
+            try:
+                await self.receive(ws)
+            except Exception as ex: #pylint: disable=broad-except
+                log.error(f'socket mode receive failed: {ex}')
+                RECONNECTS.inc('error')
+            finally:
+                self.connected = False
+                await ws.close()
+
+    def start(self):
+        '''
+        start the connection task
+        '''
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        '''
+        stop the connection task
+        '''
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
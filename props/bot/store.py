@@ -0,0 +1,664 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+store
+'''
+
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import asyncpg
+
+from concurrent.futures import ThreadPoolExecutor
+
+from crdt import PNCounter, ShardFiles, dump_shard, load_shard
+
+log = logging.getLogger(__name__)
+
+class UnknownStoreError(Exception):
+    '''
+    UnknownStoreError
+    '''
+    def __init__(self, backend):
+        '''
+        init
+        '''
+        msg = f'unknown props store backend; backend = {backend}'
+        super(UnknownStoreError, self).__init__(msg)
+
+class PropsStore:
+    '''
+    props storage interface; values are integers keyed by (scope, name, prop);
+    stores every worker shares also dedupe event ids across workers
+    '''
+    shared = False
+
+    async def open(self):
+        '''
+        open
+        '''
+
+    async def close(self):
+        '''
+        close
+        '''
+
+    async def get(self, key):
+        '''
+        current value of key, 0 if unset
+        '''
+        raise NotImplementedError
+
+    async def incr(self, key, delta):
+        '''
+        atomically add delta to key and return the new value
+        '''
+        values = await self.incr_many({key: delta})
+        return values[key]
+
+    async def incr_many(self, deltas):
+        '''
+        atomically apply {key: delta} and return {key: new value}
+        '''
+        raise NotImplementedError
+
+    async def items(self):
+        '''
+        every stored {key: value}
+        '''
+        raise NotImplementedError
+
+    async def claim(self, event_id, ttl):
+        '''
+        True unless another worker claimed event_id within ttl seconds
+        '''
+        return True
+
+    async def unclaim(self, event_id):
+        '''
+        drop the claim on event_id so a redelivery is handled again
+        '''
+
+class MemoryStore(PropsStore):
+    '''
+    process-local store, lost on restart
+    '''
+    def __init__(self):
+        '''
+        init
+        '''
+        self.values = {}
+
+    async def get(self, key):
+        '''
+        get
+        '''
+        return self.values.get(key, 0)
+
+    async def incr_many(self, deltas):
+        '''
+        incr_many
+        '''
+        for key, delta in deltas.items():
+            self.values[key] = self.values.get(key, 0) + delta
+        return {key: self.values[key] for key in deltas}
+
+    async def items(self):
+        '''
+        items
+        '''
+        return dict(self.values)
+
+class PostgresStore(PropsStore):
+    '''
+    postgres store using an asyncpg connection pool and server-side increments
+    '''
+    schema = '''
+        CREATE TABLE IF NOT EXISTS props (
+            scope TEXT NOT NULL DEFAULT 'global',
+            name TEXT NOT NULL,
+            prop TEXT NOT NULL,
+            value BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, name, prop)
+        )
+    '''
+
+    events = '''
+        CREATE TABLE IF NOT EXISTS props_events (
+            event_id TEXT PRIMARY KEY,
+            expires TIMESTAMPTZ NOT NULL
+        )
+    '''
+
+    ## tables created before scopes existed hold the global scope
+    migrations = [
+        '''
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'props' AND column_name = 'scope'
+            ) THEN
+                ALTER TABLE props ADD COLUMN scope TEXT NOT NULL DEFAULT 'global';
+                ALTER TABLE props DROP CONSTRAINT props_pkey;
+                ALTER TABLE props ADD PRIMARY KEY (scope, name, prop);
+            END IF;
+        END
+        $$
+        ''',
+    ]
+
+    select = 'SELECT value FROM props WHERE scope = $1 AND name = $2 AND prop = $3'
+
+    select_all = 'SELECT scope, name, prop, value FROM props'
+
+    upsert = '''
+        INSERT INTO props (scope, name, prop, value)
+        SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::bigint[])
+        ON CONFLICT (scope, name, prop) DO UPDATE SET value = props.value + EXCLUDED.value
+        RETURNING scope, name, prop, value
+    '''
+
+    ## an expired claim is taken over; RETURNING is empty when the event is already claimed
+    claim_event = '''
+        INSERT INTO props_events (event_id, expires) VALUES ($1, now() + $2 * interval '1 second')
+        ON CONFLICT (event_id) DO UPDATE SET expires = EXCLUDED.expires WHERE props_events.expires < now()
+        RETURNING event_id
+    '''
+
+    unclaim_event = 'DELETE FROM props_events WHERE event_id = $1'
+
+    purge = 'DELETE FROM props_events WHERE expires < now()'
+
+    shared = True
+
+    def __init__(self, dsn, min_size=1, max_size=10, purge_every=1000):
+        '''
+        init
+        '''
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.purge_every = purge_every
+        self.claims = 0
+        self.pool = None
+
+    async def open(self):
+        '''
+        create the pool, the props table and apply the migrations
+        '''
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(self.schema)
+                await conn.execute(self.events)
+                for migration in self.migrations:
+                    await conn.execute(migration)
+
+    async def close(self):
+        '''
+        close the pool
+        '''
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def get(self, key):
+        '''
+        get
+        '''
+        value = await self.pool.fetchval(self.select, *key)
+        return value or 0
+
+    async def incr_many(self, deltas):
+        '''
+        one upsert statement for every key in deltas
+        '''
+        if not deltas:
+            return {}
+        scopes, names, props = zip(*deltas.keys())
+        rows = await self.pool.fetch(self.upsert, list(scopes), list(names), list(props), list(deltas.values()))
+        return {(row['scope'], row['name'], row['prop']): row['value'] for row in rows}
+
+    async def items(self):
+        '''
+        items
+        '''
+        rows = await self.pool.fetch(self.select_all)
+        return {(row['scope'], row['name'], row['prop']): row['value'] for row in rows}
+
+    async def claim(self, event_id, ttl):
+        '''
+        claim event_id in the events table; expired claims are purged every purge_every claims
+        '''
+        self.claims += 1
+        if self.claims % self.purge_every == 0:
+            await self.pool.execute(self.purge)
+        return await self.pool.fetchval(self.claim_event, event_id, ttl) is not None
+
+    async def unclaim(self, event_id):
+        '''
+        unclaim
+        '''
+        await self.pool.execute(self.unclaim_event, event_id)
+
+class SQLiteStore(PropsStore):
+    '''
+    embedded sqlite store in wal mode; one connection, owned by a dedicated thread
+    that runs every statement so the event loop never blocks on disk
+    '''
+    schema = '''
+        CREATE TABLE IF NOT EXISTS props (
+            scope TEXT NOT NULL DEFAULT 'global',
+            name TEXT NOT NULL,
+            prop TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, name, prop)
+        ) WITHOUT ROWID
+    '''
+
+    events = '''
+        CREATE TABLE IF NOT EXISTS props_events (
+            event_id TEXT PRIMARY KEY,
+            expires REAL NOT NULL
+        ) WITHOUT ROWID
+    '''
+
+    expire_event = 'DELETE FROM props_events WHERE event_id = ? AND expires < ?'
+
+    claim_event = 'INSERT OR IGNORE INTO props_events (event_id, expires) VALUES (?, ?)'
+
+    unclaim_event = 'DELETE FROM props_events WHERE event_id = ?'
+
+    purge = 'DELETE FROM props_events WHERE expires < ?'
+
+    ## INSERT OR IGNORE then UPDATE rather than an upsert, which needs sqlite 3.24
+    insert = 'INSERT OR IGNORE INTO props (scope, name, prop) VALUES (?, ?, ?)'
+
+    update = 'UPDATE props SET value = value + ? WHERE scope = ? AND name = ? AND prop = ?'
+
+    select = 'SELECT value FROM props WHERE scope = ? AND name = ? AND prop = ?'
+
+    select_all = 'SELECT scope, name, prop, value FROM props'
+
+    shared = True
+
+    def __init__(self, path, mmap_size=268435456, synchronous='NORMAL', timeout=5.0, purge_every=1000): #pylint: disable=too-many-arguments
+        '''
+        init
+        '''
+        self.path = path
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        self.timeout = timeout
+        self.purge_every = purge_every
+        self.claims = 0
+        self.conn = None
+        self.executor = None
+
+    async def call(self, func, *args):
+        '''
+        run func on the store's thread
+        '''
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def connect(self):
+        '''
+        open the connection and create the props table
+        '''
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        self.conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        self.conn.execute(self.schema)
+        self.conn.execute(self.events)
+        log.info(f'sqlite store opened at {self.path}')
+
+    def disconnect(self):
+        '''
+        checkpoint the wal and close the connection
+        '''
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.conn.close()
+        self.conn = None
+
+    def fetch(self, key):
+        '''
+        fetch
+        '''
+        row = self.conn.execute(self.select, key).fetchone()
+        return row[0] if row else 0
+
+    def fetch_all(self):
+        '''
+        fetch_all
+        '''
+        return {(scope, name, prop): value for scope, name, prop, value in self.conn.execute(self.select_all)}
+
+    def apply(self, deltas):
+        '''
+        apply deltas in one transaction and return the new values
+        '''
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.executemany(self.insert, deltas.keys())
+            self.conn.executemany(self.update, [(delta,) + key for key, delta in deltas.items()])
+            values = {key: self.fetch(key) for key in deltas}
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+        return values
+
+    def take(self, event_id, ttl):
+        '''
+        take over an expired claim on event_id or make a new one; True if this call claimed it
+        '''
+        now = time.time()
+        self.claims += 1
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.claims % self.purge_every == 0:
+                self.conn.execute(self.purge, (now,))
+            self.conn.execute(self.expire_event, (event_id, now))
+            claimed = self.conn.execute(self.claim_event, (event_id, now + ttl)).rowcount == 1
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+        return claimed
+
+    def untake(self, event_id):
+        '''
+        untake
+        '''
+        self.conn.execute(self.unclaim_event, (event_id,))
+
+    async def open(self):
+        '''
+        start the store's thread and connect on it
+        '''
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        await self.call(self.connect)
+
+    async def close(self):
+        '''
+        close the connection and stop the thread
+        '''
+        if self.executor is not None:
+            if self.conn is not None:
+                await self.call(self.disconnect)
+            self.executor.shutdown()
+            self.executor = None
+
+    async def get(self, key):
+        '''
+        get
+        '''
+        return await self.call(self.fetch, key)
+
+    async def incr_many(self, deltas):
+        '''
+        incr_many
+        '''
+        if not deltas:
+            return {}
+        return await self.call(self.apply, dict(deltas))
+
+    async def items(self):
+        '''
+        items
+        '''
+        return await self.call(self.fetch_all)
+
+    async def claim(self, event_id, ttl):
+        '''
+        claim
+        '''
+        return await self.call(self.take, event_id, ttl)
+
+    async def unclaim(self, event_id):
+        '''
+        unclaim
+        '''
+        await self.call(self.untake, event_id)
+
+class WriteBehindStore(PropsStore):
+    '''
+    coalesces increments per key in memory and flushes them to store in one batch
+    '''
+    def __init__(self, store, size=100, interval=1.0):
+        '''
+        init
+        '''
+        self.store = store
+        self.size = size
+        self.interval = interval
+        self.base = {}
+        self.pending = {}
+        self.inflight = {}
+        self.generation = 0
+        self.lock = None
+        self.idle = None
+        self.task = None
+
+    async def open(self):
+        '''
+        open the backing store and start the periodic flusher
+        '''
+        await self.store.open()
+        self.lock = asyncio.Lock()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.task = asyncio.ensure_future(self.flusher())
+
+    async def close(self):
+        '''
+        stop the flusher, flush what is pending and close the backing store
+        '''
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.flush()
+        await self.store.close()
+
+    async def get(self, key):
+        '''
+        cached stored value plus the deltas not yet written; a key's first read since
+        the last flush seeds the cache from the backing store and is retried if a flush
+        overlaps it, so other writers' increments show up within one flush interval
+        '''
+        while key not in self.base:
+            if key in self.inflight:
+                await self.idle.wait()
+                continue
+            generation = self.generation
+            value = await self.store.get(key)
+            if generation == self.generation and key not in self.inflight:
+                self.base.setdefault(key, value)
+        return self.base[key] + self.inflight.get(key, 0) + self.pending.get(key, 0)
+
+    async def incr_many(self, deltas):
+        '''
+        queue deltas for the next flush; flushes early once size keys are pending
+        '''
+        for key, delta in deltas.items():
+            self.pending[key] = self.pending.get(key, 0) + delta
+        if len(self.pending) >= self.size:
+            asyncio.ensure_future(self.flush())
+        return {key: await self.get(key) for key in deltas}
+
+    async def items(self):
+        '''
+        items
+        '''
+        await self.flush()
+        return await self.store.items()
+
+    @property
+    def shared(self):
+        '''
+        shared
+        '''
+        return self.store.shared
+
+    async def claim(self, event_id, ttl):
+        '''
+        claim
+        '''
+        return await self.store.claim(event_id, ttl)
+
+    async def unclaim(self, event_id):
+        '''
+        unclaim
+        '''
+        await self.store.unclaim(event_id)
+
+    async def flush(self):
+        '''
+        write every pending delta to the backing store in one batch and expire the cached values
+        '''
+        async with self.lock:
+            self.base = {}
+            if not self.pending:
+                return
+            self.inflight, self.pending = self.pending, {}
+            self.generation += 1
+            self.idle.clear()
+            try:
+                await self.store.incr_many(self.inflight)
+            except Exception:
+                for key, delta in self.inflight.items():
+                    self.pending[key] = self.pending.get(key, 0) + delta
+                raise
+            finally:
+                self.inflight = {}
+                self.idle.set()
+
+    async def flusher(self):
+        '''
+        flush every interval seconds until cancelled
+        '''
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as ex: #pylint: disable=broad-except
+                log.error(f'props flush failed: {ex}')
+
+class CRDTStore(PropsStore):
+    '''
+    lock-free per-process pn-counter shard, reconciled with the shards of the
+    other worker processes through a shared directory every interval seconds
+    '''
+    def __init__(self, path, interval=0.5):
+        '''
+        init
+        '''
+        self.files = ShardFiles(path)
+        self.interval = interval
+        self.counter = None
+        self.dirty = False
+        self.task = None
+
+    async def open(self):
+        '''
+        claim a shard, resume it, merge the others and start the syncer
+        '''
+        replica = self.files.claim()
+        self.counter = PNCounter(replica)
+        for other, text in self.files.read().items():
+            self.counter.merge(other, load_shard(text))
+        self.task = asyncio.ensure_future(self.syncer())
+
+    async def close(self):
+        '''
+        stop the syncer, write the shard a last time and release it
+        '''
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.sync()
+        self.files.release()
+
+    async def get(self, key):
+        '''
+        get
+        '''
+        return self.counter.value(key)
+
+    async def incr_many(self, deltas):
+        '''
+        incr_many
+        '''
+        for key, delta in deltas.items():
+            self.counter.incr(key, delta)
+        self.dirty = True
+        return {key: self.counter.value(key) for key in deltas}
+
+    async def items(self):
+        '''
+        items
+        '''
+        return dict(self.counter.totals)
+
+    async def sync(self):
+        '''
+        publish this shard if it changed since the last sync and merge every other one,
+        with the file i/o in the default executor
+        '''
+        if self.counter is None:
+            return
+        loop = asyncio.get_event_loop()
+        if self.dirty:
+            self.dirty = False
+            try:
+                texts = await loop.run_in_executor(None, self.files.sync, dump_shard(self.counter.shard))
+            except Exception:
+                self.dirty = True
+                raise
+        else:
+            texts = await loop.run_in_executor(None, self.files.read)
+        for replica, other in texts.items():
+            if replica != self.counter.replica:
+                self.counter.merge(replica, load_shard(other))
+
+    async def syncer(self):
+        '''
+        sync every interval seconds until cancelled
+        '''
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sync()
+            except Exception as ex: #pylint: disable=broad-except
+                log.error(f'crdt sync failed: {ex}')
+
+STORES = {
+    'memory': lambda cfg: MemoryStore(),
+    'postgres': lambda cfg: PostgresStore(cfg.DATABASE_URL, min_size=cfg.DB_POOL_MIN, max_size=cfg.DB_POOL_MAX),
+    'crdt': lambda cfg: CRDTStore(cfg.CRDT_PATH, interval=cfg.CRDT_SYNC_INTERVAL),
+    'sqlite': lambda cfg: SQLiteStore(cfg.SQLITE_PATH, mmap_size=cfg.SQLITE_MMAP_SIZE, synchronous=cfg.SQLITE_SYNCHRONOUS),
+}
+
+## stores already answering from process memory; write-behind would only add a copy
+IN_PROCESS = ('memory', 'crdt')
+
+def make_store(cfg):
+    '''
+    construct the store backend selected by cfg.PROPS_STORE
+    '''
+    if cfg.PROPS_STORE not in STORES:
+        raise UnknownStoreError(cfg.PROPS_STORE)
+    store = STORES[cfg.PROPS_STORE](cfg)
+    if cfg.PROPS_WRITE_BEHIND and cfg.PROPS_STORE not in IN_PROCESS:
+        return WriteBehindStore(store, size=cfg.PROPS_FLUSH_SIZE, interval=cfg.PROPS_FLUSH_INTERVAL)
+    return store
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+end-to-end load benchmark: drives the quart app against an in-process fake
+slack web api and reports ack latency, throughput and slack calls per event
+
+needs props/bot on PYTHONPATH; see task_bench in dodo.py
+'''
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+from collections import Counter
+
+from fakeslack import FakeSlack
+from replay import synthetic, recorded
+
+TOKEN = 'bench-token'
+TEAM_ID = 'TBENCH'
+CHANNEL = 'CBENCH'
+
+os.environ.update(
+    SLACK_VERIFICATION_TOKEN=TOKEN,
+    SLACK_TEAM_ID=TEAM_ID,
+    PROPS_BOT_CHANNEL_ID=CHANNEL,
+    BOT_USER_OAUTH_ACCESS_TOKEN='xoxb-bench',
+    PROPS_STORE=os.environ.get('PROPS_STORE', 'memory'),
+    PROPS_JOURNAL='')
+
+import main #pylint: disable=wrong-import-position
+
+def percentile(values, fraction):
+    '''
+    nearest-rank percentile of sorted values
+    '''
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+async def fire(client, payloads, rate):
+    '''
+    post payloads to /slack/events at rate per second; returns latencies, statuses and elapsed seconds
+    '''
+    latencies, statuses = [], Counter()
+
+    async def post(payload):
+        '''
+        post
+        '''
+        start = time.monotonic()
+        response = await client.post('/slack/events', json=payload)
+        latencies.append(time.monotonic() - start)
+        statuses[response.status_code] += 1
+
+    tasks, start = [], time.monotonic()
+    for number, payload in enumerate(payloads):
+        delay = start + number / rate - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(post(payload)))
+    await asyncio.gather(*tasks)
+    return sorted(latencies), statuses, time.monotonic() - start
+
+async def settle(timeout):
+    '''
+    wait for the event queue and the outbox to drain
+    '''
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not main.PIPELINE.depth and not main.OUTBOX.tasks:
+            await main.PIPELINE.queue.join()
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+async def bench(args):
+    '''
+    run one benchmark and return the report
+    '''
+    fake = FakeSlack(users=args.users, latency=args.latency, ratelimit=args.ratelimit)
+    main.SLACK.url = await fake.start()
+    if args.replay:
+        payloads = list(recorded(args.replay, token=TOKEN, team_id=TEAM_ID))
+    else:
+        payloads = list(synthetic(
+            args.events,
+            users=args.users,
+            channel=CHANNEL,
+            token=TOKEN,
+            team_id=TEAM_ID,
+            retries=args.retries))
+    await main.app.startup()
+    try:
+        while main.DIRECTORY.refreshed is None:
+            await asyncio.sleep(0.01)
+        warmup = fake.calls.copy()
+        latencies, statuses, elapsed = await fire(main.app.test_client(), payloads, args.rate)
+        drained = await settle(args.timeout)
+        calls = fake.calls.copy()
+        calls.subtract(warmup) #note: the startup warm-up is not per-event work
+    finally:
+        await main.app.shutdown()
+        await fake.stop()
+    events = len(payloads)
+    return dict(
+        events=events,
+        elapsed=round(elapsed, 3),
+        throughput=round(events / elapsed, 1),
+        statuses={str(status): count for status, count in statuses.items()},
+        ack_ms=dict(
+            p50=round(percentile(latencies, 0.50) * 1000, 3),
+            p95=round(percentile(latencies, 0.95) * 1000, 3),
+            p99=round(percentile(latencies, 0.99) * 1000, 3),
+            max=round(latencies[-1] * 1000, 3) if latencies else 0.0),
+        slack_calls=dict(+calls),
+        slack_calls_per_event=round(sum((+calls).values()) / events, 3) if events else 0.0,
+        ratelimited=dict(fake.ratelimited),
+        messages=len(fake.messages),
+        drained=drained,
+        pipeline=main.PIPELINE.stats,
+        dedupe=main.DEDUPE.stats)
+
+def parse_args(argv):
+    '''
+    parse_args
+    '''
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1000, help='synthetic events to send')
+    parser.add_argument('--rate', type=float, default=200.0, help='events per second')
+    parser.add_argument('--users', type=int, default=100, help='users in the fake workspace')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every fake slack call')
+    parser.add_argument('--ratelimit', type=float, default=0.0, help='fraction of fake slack calls answered with 429')
+    parser.add_argument('--retries', type=float, default=0.0, help='fraction of events redelivered')
+    parser.add_argument('--replay', help='file of recorded payloads, one json object per line')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds to wait for the queue to drain')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    REPORT = asyncio.get_event_loop().run_until_complete(bench(parse_args(sys.argv[1:])))
+    print(json.dumps(REPORT, indent=4, sort_keys=True))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+regression gate for the micro-benchmarks: compares each benchmark's mean relative
+to the reference benchmark of the same run, so a slower or faster machine than the
+one the baseline was recorded on does not fail or pass the gate by itself
+
+exits 1 when a relative mean regressed past the threshold; see task_test in dodo.py
+'''
+
+import sys
+import json
+import argparse
+
+REFERENCE = 'test_reference'
+
+def means(filename, stat='min'):
+    '''
+    {name: seconds} of stat, min by default as the least disturbed by noise, in a pytest-benchmark json file
+    '''
+    with open(filename) as f:
+        return {benchmark['name']: benchmark['stats'][stat] for benchmark in json.load(f)['benchmarks']}
+
+def compare(baseline, current, threshold, reference=REFERENCE):
+    '''
+    {name: relative change} of every benchmark in both runs, and the names that regressed past threshold
+    '''
+    changes = {}
+    for name in sorted(set(baseline) & set(current) - {reference}):
+        changes[name] = (current[name] / current[reference]) / (baseline[name] / baseline[reference]) - 1
+    return changes, [name for name, change in changes.items() if change > threshold]
+
+def parse_args(argv):
+    '''
+    parse_args
+    '''
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline', help='pytest-benchmark json saved by task_baseline')
+    parser.add_argument('current', help='pytest-benchmark json of this run')
+    parser.add_argument('--threshold', type=float, default=0.25, help='largest tolerated relative regression')
+    parser.add_argument('--reference', default=REFERENCE, help='benchmark the others are measured against')
+    return parser.parse_args(argv)
+
+def main(argv):
+    '''
+    print every relative change; 1 if any regressed
+    '''
+    args = parse_args(argv)
+    baseline, current = means(args.baseline), means(args.current)
+    if args.reference not in baseline or args.reference not in current:
+        print(f'{args.reference} missing; record a new baseline with `doit baseline`')
+        return 1
+    changes, regressed = compare(baseline, current, args.threshold, args.reference)
+    for name, change in changes.items():
+        print(f'{name}: {change:+.1%} relative to {args.reference}{" REGRESSED" if name in regressed else ""}')
+    return 1 if regressed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+in-process stand-in for the slack web api with injectable latency and 429s,
+plus a socket mode websocket endpoint
+'''
+
+import json
+import random
+import asyncio
+
+from collections import Counter
+from aiohttp import web, WSMsgType
+
+class FakeSlack:
+    '''
+    serves users.list, channels.info, chat.postMessage, api.test, auth.test and
+    apps.connections.open for a synthetic workspace of users user0..userN all in
+    every channel; push() sends socket mode envelopes to every connected socket
+    '''
+    def __init__(self, users=100, latency=0.0, ratelimit=0.0, page=200):
+        '''
+        init
+        '''
+        self.users = [dict(id=f'U{number}', name=f'user{number}') for number in range(users)]
+        self.latency = latency
+        self.ratelimit = ratelimit
+        self.page = page
+        self.calls = Counter()
+        self.ratelimited = Counter()
+        self.messages = []
+        self.sockets = []
+        self.acks = []
+        self.envelopes = 0
+        self.runner = None
+        self.url = None
+
+    def users_list(self, form):
+        '''
+        users.list, paginated by an integer offset cursor
+        '''
+        offset = int(form.get('cursor') or 0)
+        limit = int(form.get('limit') or self.page)
+        members = self.users[offset:offset + limit]
+        cursor = str(offset + limit) if offset + limit < len(self.users) else ''
+        return dict(ok=True, members=members, response_metadata=dict(next_cursor=cursor))
+
+    def channels_info(self, form):
+        '''
+        channels.info
+        '''
+        members = [user['id'] for user in self.users]
+        return dict(ok=True, channel=dict(id=form.get('channel'), members=members))
+
+    def chat_post_message(self, form):
+        '''
+        chat.postMessage
+        '''
+        self.messages.append((form.get('channel'), form.get('text')))
+        return dict(ok=True, ts=str(len(self.messages)))
+
+    def apps_connections_open(self, form): #pylint: disable=unused-argument
+        '''
+        apps.connections.open
+        '''
+        return dict(ok=True, url=self.url.replace('http://', 'ws://', 1).replace('/api', '/link'))
+
+    async def link(self, request):
+        '''
+        socket mode websocket: says hello, then records acks until closed
+        '''
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        await ws.send_json(dict(type='hello', num_connections=len(self.sockets)))
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.TEXT:
+                    self.acks.append(json.loads(message.data))
+        finally:
+            self.sockets.remove(ws)
+        return ws
+
+    async def push(self, kind, payload):
+        '''
+        send one envelope of type kind to every connected socket; returns its envelope_id
+        '''
+        self.envelopes += 1
+        envelope_id = f'env{self.envelopes}'
+        envelope = dict(type=kind, envelope_id=envelope_id, payload=payload, accepts_response_payload=kind != 'events_api')
+        for ws in list(self.sockets):
+            await ws.send_json(envelope)
+        return envelope_id
+
+    async def disconnect(self, reason='refresh_requested'):
+        '''
+        ask every connected socket to reconnect
+        '''
+        for ws in list(self.sockets):
+            await ws.send_json(dict(type='disconnect', reason=reason))
+
+    async def handle(self, request):
+        '''
+        dispatch one api call
+        '''
+        method = request.match_info['method']
+        self.calls[method] += 1
+        form = await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if random.random() < self.ratelimit:
+            self.ratelimited[method] += 1
+            return web.json_response(dict(ok=False, error='ratelimited'), status=429, headers={'Retry-After': '1'})
+        handlers = {
+            'users.list': self.users_list,
+            'channels.info': self.channels_info,
+            'chat.postMessage': self.chat_post_message,
+            'apps.connections.open': self.apps_connections_open,
+        }
+        handler = handlers.get(method, lambda form: dict(ok=True))
+        return web.json_response(handler(form))
+
+    def application(self):
+        '''
+        application
+        '''
+        app = web.Application()
+        app.router.add_post('/api/{method}', self.handle)
+        app.router.add_get('/link', self.link)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        '''
+        start serving; returns the api base url
+        '''
+        self.runner = web.AppRunner(self.application())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1] #pylint: disable=protected-access
+        self.url = f'http://{host}:{port}/api'
+        return self.url
+
+    async def stop(self):
+        '''
+        stop
+        '''
+        for ws in list(self.sockets):
+            await ws.close()
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
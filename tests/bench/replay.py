@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+slack event payload generators for the load benchmark
+'''
+
+import json
+import random
+
+def synthetic(count, users=100, channel='C1', token='token', team_id='T1', retries=0.0, seed=0): #pylint: disable=too-many-arguments
+    '''
+    yield count events_api payloads carrying props messages between users;
+    a retries fraction of them is followed by a redelivery of the same event_id
+    '''
+    rng = random.Random(seed)
+    props = ['props', 'docs', 'review', 'kudos']
+    for number in range(count):
+        exprs = []
+        for _ in range(rng.randint(1, 3)):
+            name = f'user{rng.randrange(users)}'
+            prop = rng.choice(props)
+            exprs.append(rng.choice([f'{name}++', f'{name}:{prop}++', f'{name}:{prop}+={rng.randint(1, 5)}']))
+        payload = dict(
+            token=token,
+            team_id=team_id,
+            type='event_callback',
+            event_id=f'Ev{number:08d}',
+            event=dict(
+                type='message',
+                channel=channel,
+                user=f'U{rng.randrange(users)}',
+                text=f'thanks {" ".join(exprs)}!',
+                ts=f'{1500000000 + number}.000100'))
+        yield payload
+        if rng.random() < retries:
+            yield payload
+
+def recorded(path, token='token', team_id='T1'):
+    '''
+    yield payloads from a file of one json payload per line, rewriting the
+    verification token and team id so they pass is_request_valid
+    '''
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                payload = json.loads(line)
+                payload.update(token=token, team_id=team_id)
+                yield payload
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from tests.bench.compare import compare
+
+def test_compare_is_relative_to_reference():
+    '''
+    a uniformly slower machine does not regress; a benchmark slower relative to the reference does
+    '''
+    baseline = dict(test_reference=1.0, test_parse=3.0, test_update_many=2.0)
+    slower = {name: seconds * 2 for name, seconds in baseline.items()}
+    changes, regressed = compare(baseline, slower, 0.25)
+    assert changes == dict(test_parse=pytest.approx(0.0), test_update_many=pytest.approx(0.0))
+    assert regressed == []
+    slower['test_update_many'] *= 1.5
+    changes, regressed = compare(baseline, slower, 0.25)
+    assert changes['test_update_many'] == pytest.approx(0.5)
+    assert regressed == ['test_update_many']
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+pytest-benchmark micro-benchmarks for the per-message hot paths; baselines
+live in tests/bench/baselines and are compared relative to test_reference by
+compare.py, see task_test and task_baseline in dodo.py
+'''
+
+import asyncio
+import random
+
+import pytest
+
+from props.bot.propsbot import PropsBot, parse_regex
+from props.bot.models import Event
+from props.bot.store import MemoryStore
+from props.bot.leaderboard import Leaderboard
+from props.bot.partitions import GLOBAL_SCOPE
+from tests.bench.replay import synthetic
+
+CHATTER = [
+    'morning all, standup in 5',
+    'can someone review https://github.com/mozilla-it/props-bot/pull/42 ?',
+    'the build is red again -- looking into it',
+    'c++ is not a prop, neither is i++ in a for loop',
+    'lunch?',
+]
+
+def corpus(count=1000, seed=0):
+    '''
+    a realistic channel: mostly chatter, roughly one message in four carrying props
+    '''
+    rng = random.Random(seed)
+    props = [payload['event']['text'] for payload in synthetic(count, seed=seed)]
+    return [rng.choice(props) if rng.random() < 0.25 else rng.choice(CHATTER) for _ in range(count)]
+
+class Outbox:
+    '''
+    collects replies instead of posting them
+    '''
+    def __init__(self):
+        '''
+        init
+        '''
+        self.posted = []
+
+    def post(self, channel, message):
+        '''
+        post
+        '''
+        self.posted.append((channel, message))
+
+@pytest.fixture(scope='module')
+def texts():
+    '''
+    texts
+    '''
+    return corpus()
+
+def test_reference(benchmark, texts):
+    '''
+    fixed interpreter workload, independent of the bot, that compare.py measures the others against
+    '''
+    def count():
+        counts = {}
+        for text in texts:
+            for word in text.split():
+                counts[word] = counts.get(word, 0) + 1
+        return counts
+    assert benchmark(count)
+
+def test_parse_regex(benchmark, texts):
+    '''
+    raw regex scan over the corpus
+    '''
+    def scan():
+        return sum(1 for text in texts for _ in parse_regex.finditer(text))
+    assert benchmark(scan) > 0
+
+def test_parse(benchmark, texts):
+    '''
+    PropsBot.parse over the corpus
+    '''
+    bot = PropsBot(None, Event('message', text=''))
+    def parse():
+        return [bot.parse(text) for text in texts]
+    assert len(benchmark(parse)) == len(texts)
+
+def test_parse_all(benchmark, texts):
+    '''
+    PropsBot.parse_all over the corpus
+    '''
+    bot = PropsBot(None, Event('message', text=''))
+    def parse_all():
+        return [bot.parse_all(text) for text in texts]
+    assert any(benchmark(parse_all))
+
+def test_update_many(benchmark, texts):
+    '''
+    PropsBot.update_many against the memory store and leaderboard for every message carrying props;
+    both start from a populated ranking so every update moves an existing entry
+    '''
+    loop = asyncio.new_event_loop()
+    parser = PropsBot(None, Event('message', text=''))
+    batches = [updates for updates in (parser.parse_all(text) for text in texts) if updates]
+    population = {
+        (GLOBAL_SCOPE, f'user{number}', prop): number % 50
+        for number in range(100)
+        for prop in ('props', 'docs', 'review', 'kudos')}
+    store, leaderboard = MemoryStore(), Leaderboard()
+    store.values.update(population)
+    leaderboard.load(population)
+    bot = PropsBot(
+        None,
+        Event('message', channel='C1', user='U1', text=''),
+        store=store,
+        outbox=Outbox(),
+        leaderboard=leaderboard)
+    async def update_all():
+        for updates in batches:
+            await bot.update_many(updates)
+    try:
+        benchmark(lambda: loop.run_until_complete(update_all()))
+    finally:
+        loop.close()
+    assert bot.outbox.posted
+    assert leaderboard.values == store.values != population
@@ -1,10 +1,93 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import pytest
+
 from props.bot.propsbot import PropsBot
+from props.bot.store import MemoryStore
+from props.bot.models import Event, Member
 
 def test_bot():
     '''
     something
     '''
     assert True
+
+def test_parse_all():
+    '''
+    every valid expression in a message is parsed; bare words are not
+    '''
+    bot = PropsBot(None, Event('message', text='alice++ bob++ carol:docs+=3 hello dave-= erin-=2'))
+    assert bot.parse_all() == [
+        ('alice', None, '++', None),
+        ('bob', None, '++', None),
+        ('carol', 'docs', '+=', '3'),
+        ('erin', None, '-=', '2'),
+    ]
+    assert bot.parse('hello world') == [None] * 4
+
+def test_parse_all_caps_operand():
+    '''
+    an oversized operand drops only its own expression
+    '''
+    bot = PropsBot(None, Event('message', text='alice+=99999999999999999999 bob++ carol+=999 dave-=1000'))
+    assert bot.parse_all() == [
+        ('bob', None, '++', None),
+        ('carol', None, '+=', '999'),
+    ]
+
+def test_event_from_json():
+    '''
+    only the fields the bot reads are kept; a user object becomes a Member
+    '''
+    event = Event.from_json(dict(
+        type='message',
+        channel='C1',
+        user='U1',
+        text='alice++',
+        ts='1.0',
+        client_msg_id='m1',
+        blocks=[dict(type='rich_text')]))
+    assert (event.type, event.channel, event.user, event.text, event.event_id) == ('message', 'C1', 'U1', 'alice++', 'm1')
+    assert not hasattr(event, '__dict__')
+    event = Event.from_json(dict(type='team_join', user=dict(id='U2', name='bob', profile={})), event_id='Ev1')
+    assert event.user == Member('U2', 'bob')
+    assert event.event_id == 'Ev1'
+
+def test_update_many_journals_after_store(run):
+    '''
+    a failed increment leaves nothing in the journal; an applied one journals every update
+    '''
+    class Store(MemoryStore):
+        def __init__(self):
+            super().__init__()
+            self.down = True
+
+        async def incr_many(self, deltas):
+            if self.down:
+                raise ConnectionError('store down')
+            return await super().incr_many(deltas)
+
+    class Journal:
+        def __init__(self):
+            self.records = []
+
+        def append(self, *record):
+            self.records.append(record)
+
+    class Outbox:
+        def post(self, channel, message):
+            pass
+
+    store, journal = Store(), Journal()
+    event = Event('message', channel='C1', user='U1', text='alice++ bob:docs+=2', event_id='Ev1')
+    bot = PropsBot(None, event, store=store, outbox=Outbox(), journal=journal)
+    with pytest.raises(ConnectionError):
+        run(bot.update_many(bot.parse_all()))
+    assert journal.records == []
+    store.down = False
+    run(bot.update_many(bot.parse_all()))
+    assert journal.records == [
+        ('U1', ('global', 'alice', 'props'), '++', None, 1, 'Ev1'),
+        ('U1', ('global', 'bob', 'docs'), '+=', '2', 2, 'Ev1'),
+    ]
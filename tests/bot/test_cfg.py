@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import signal
+import asyncio
+
+from props.bot import cfg as config
+from props.bot.cfg import AutoConfigPlus, NotGitRepoError, load_buildinfo
+
+def test_resolved_once(tmpdir, monkeypatch):
+    '''
+    a value is cast and cached on first read; invalidate() makes the next read resolve it again
+    '''
+    cfg = AutoConfigPlus(search_path=str(tmpdir))
+    monkeypatch.setenv('PROPS_TEST_VALUE', '7')
+    assert cfg.PROPS_TEST_VALUE == 7
+    monkeypatch.setenv('PROPS_TEST_VALUE', 'eight')
+    assert cfg.PROPS_TEST_VALUE == 7
+    assert cfg.resolved == {'PROPS_TEST_VALUE'}
+    cfg.invalidate()
+    assert cfg.resolved == set()
+    assert cfg.PROPS_TEST_VALUE == 'eight'
+
+def test_schema_cast(tmpdir, monkeypatch):
+    '''
+    keys declared in SCHEMA keep their declared type instead of the int guess
+    '''
+    cfg = AutoConfigPlus(search_path=str(tmpdir))
+    monkeypatch.setenv('SLACK_TEAM_ID', '0123')
+    monkeypatch.setenv('PROPS_TEST_VALUE', '0123')
+    assert cfg.SLACK_TEAM_ID == '0123'
+    assert cfg.PROPS_TEST_VALUE == 123
+
+def test_sighup_invalidates(tmpdir, monkeypatch, run):
+    '''
+    SIGHUP clears the cache the way startup wires it
+    '''
+    cfg = AutoConfigPlus(search_path=str(tmpdir))
+    monkeypatch.setenv('PROPS_TEST_VALUE', '1')
+    assert cfg.PROPS_TEST_VALUE == 1
+    monkeypatch.setenv('PROPS_TEST_VALUE', '2')
+
+    async def hangup():
+        loop = asyncio.get_event_loop()
+        loop.add_signal_handler(signal.SIGHUP, cfg.invalidate)
+        try:
+            os.kill(os.getpid(), signal.SIGHUP)
+            for _ in range(100):
+                if not cfg.resolved:
+                    return
+                await asyncio.sleep(0.01)
+        finally:
+            loop.remove_signal_handler(signal.SIGHUP)
+
+    run(hangup())
+    assert cfg.PROPS_TEST_VALUE == 2
+
+class Git:
+    '''
+    stands in for cfg.git: records calls, answers from replies, raises NotGitRepoError without a reply
+    '''
+    def __init__(self, **replies):
+        self.replies = replies
+        self.calls = []
+
+    def __call__(self, *args):
+        self.calls.append(args)
+        if args[-1] not in self.replies:
+            raise NotGitRepoError
+        return self.replies[args[-1]]
+
+def test_load_buildinfo(tmpdir):
+    '''
+    the snapshot is read when present; a missing or corrupt file reads as empty
+    '''
+    path = tmpdir.join('buildinfo.json')
+    assert load_buildinfo(str(path)) == {}
+    path.write('{not json')
+    assert load_buildinfo(str(path)) == {}
+    path.write(json.dumps(dict(APP_VERSION='v1.2.3')))
+    assert load_buildinfo(str(path)) == dict(APP_VERSION='v1.2.3')
+
+def test_build_precedence(tmpdir, monkeypatch):
+    '''
+    build metadata comes from buildinfo.json, else git, else the environment
+    '''
+    path = tmpdir.join('buildinfo.json')
+    path.write(json.dumps(dict(APP_VERSION='v1.2.3')))
+    git = Git(HEAD='feature')
+    monkeypatch.setattr(config, 'BUILDINFO', load_buildinfo(str(path)))
+    monkeypatch.setattr(config, 'git', git)
+    monkeypatch.setenv('APP_REMOTE_ORIGIN_URL', 'git@github.com:org/repo.git')
+    cfg = AutoConfigPlus(search_path=str(tmpdir))
+    assert cfg.APP_VERSION == 'v1.2.3'
+    assert cfg.APP_BRANCH == 'feature'
+    assert cfg.APP_REMOTE_ORIGIN_URL == 'git@github.com:org/repo.git'
+    assert git.calls == [
+        ('rev-parse', '--abbrev-ref', 'HEAD'),
+        ('config', '--get', 'remote.origin.url'),
+    ]
+
+def test_build_memoized(tmpdir, monkeypatch):
+    '''
+    git runs once per value; later reads come from the instance
+    '''
+    git = Git(HEAD='feature')
+    monkeypatch.setattr(config, 'BUILDINFO', {})
+    monkeypatch.setattr(config, 'git', git)
+    cfg = AutoConfigPlus(search_path=str(tmpdir))
+    assert [cfg.APP_BRANCH, cfg.APP_BRANCH, cfg.APP_DEPENV] == ['feature', 'feature', 'dev']
+    assert git.calls == [('rev-parse', '--abbrev-ref', 'HEAD')]
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from props.bot.codec import CODECS, make_codec, UnknownCodecError
+
+PAYLOAD = dict(ok=True, members=[dict(id=f'U{number}', name=f'user{number}', real_name='Zoë') for number in range(50)])
+
+@pytest.mark.parametrize('name', [name for name, (_, available) in CODECS.items() if available()])
+def test_roundtrip(name, run):
+    '''
+    every installed codec decodes what it encodes, inline or in a thread
+    '''
+    codec = make_codec(name, threshold=1024)
+    text = codec.dumps(PAYLOAD, sort_keys=True, compact=True)
+    assert len(text) > codec.threshold
+    assert codec.loads(text) == PAYLOAD
+    assert run(codec.decode(text.encode('utf-8'))) == PAYLOAD
+    assert run(codec.decode(b'{"ok":false}')) == dict(ok=False)
+    assert codec.dumps(dict(b=1, a=2), indent=4, sort_keys=True) == '{\n    "a": 2,\n    "b": 1\n}'
+    assert codec.dumps(dict(b=1, a=2), indent=4, sort_keys=True, compact=True) == '{"a":2,"b":1}'
+
+def test_make_codec():
+    '''
+    auto picks an installed codec; unknown names are rejected
+    '''
+    assert CODECS[make_codec().name][1]()
+    with pytest.raises(UnknownCodecError):
+        make_codec('simdjson')
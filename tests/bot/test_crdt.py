@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from props.bot.crdt import PNCounter
+from props.bot.store import CRDTStore
+
+KEY = ('global', 'alice', 'props')
+
+def test_pn_counter_merge():
+    '''
+    merging is idempotent and order-free
+    '''
+    a, b = PNCounter('a'), PNCounter('b')
+    a.incr(KEY, 3)
+    a.incr(KEY, -1)
+    b.incr(KEY, 5)
+    stale = dict(a.shard)
+    a.incr(KEY, 1)
+    b.merge('a', a.shard)
+    b.merge('a', stale)
+    b.merge('a', a.shard)
+    a.merge('b', b.shard)
+    assert a.value(KEY) == b.value(KEY) == 8
+
+def test_crdt_store_workers(tmpdir, run):
+    '''
+    two workers sharing a directory converge, and a restarted worker resumes its shard
+    '''
+    async def scenario():
+        one, two = CRDTStore(str(tmpdir), interval=60), CRDTStore(str(tmpdir), interval=60)
+        await one.open()
+        await two.open()
+        assert one.counter.replica != two.counter.replica
+        await one.incr_many({KEY: 2})
+        await two.incr_many({KEY: 3, ('C2', 'bob', 'docs'): -1})
+        await one.sync()
+        await two.sync()
+        await one.sync()
+        values = await one.items(), await two.items()
+        await one.close()
+        three = CRDTStore(str(tmpdir), interval=60)
+        await three.open()
+        await three.incr_many({KEY: 1})
+        resumed = three.counter.replica, await three.get(KEY)
+        await three.close()
+        await two.close()
+        return values, resumed
+
+    (one, two), resumed = run(scenario())
+    assert one == two == {KEY: 5, ('C2', 'bob', 'docs'): -1}
+    assert resumed == ('0', 6)
+
+def test_crdt_store_skips_clean_writes(tmpdir, run):
+    '''
+    a sync with nothing incremented since the last one writes no shard but still merges the others
+    '''
+    async def scenario():
+        one, two = CRDTStore(str(tmpdir), interval=60), CRDTStore(str(tmpdir), interval=60)
+        await one.open()
+        await two.open()
+        writes = []
+        write = one.files.write
+        one.files.write = lambda text: writes.append(text) or write(text)
+        await one.incr_many({KEY: 2})
+        await one.sync()
+        await one.sync()
+        await two.incr_many({KEY: 3})
+        await two.sync()
+        await one.sync()
+        value = await one.get(KEY)
+        await one.close()
+        await two.close()
+        return len(writes), value
+
+    assert run(scenario()) == (1, 5)
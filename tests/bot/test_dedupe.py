@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from props.bot import dedupe
+from props.bot.dedupe import DedupeCache
+
+class Clock:
+    '''
+    monotonic clock moved by hand
+    '''
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+def test_seen_until_ttl(monkeypatch):
+    '''
+    a key is a hit within ttl and a miss again once it expired
+    '''
+    clock = Clock()
+    monkeypatch.setattr(dedupe, 'time', clock)
+    cache = DedupeCache(ttl=10)
+    assert not cache.seen('Ev1')
+    clock.now = 9.9
+    assert cache.seen('Ev1')
+    assert not cache.seen('Ev2')
+    clock.now = 10.0
+    assert not cache.seen('Ev1')
+    assert list(cache.entries) == ['Ev2', 'Ev1']
+    assert cache.stats == dict(size=2, maxsize=10000, hits=1, misses=3)
+
+def test_maxsize():
+    '''
+    the oldest key is dropped once maxsize keys are held
+    '''
+    cache = DedupeCache(maxsize=3)
+    for key in ['Ev1', 'Ev2', 'Ev3', 'Ev4']:
+        assert not cache.seen(key)
+    assert len(cache) == 3
+    assert not cache.seen('Ev1')
+    assert cache.seen('Ev4')
+
+def test_forget():
+    '''
+    a forgotten key is handled again; forgetting an unknown key is harmless
+    '''
+    cache = DedupeCache()
+    assert not cache.seen('Ev1')
+    cache.forget('Ev1')
+    cache.forget('Ev2')
+    assert not cache.seen('Ev1')
+    assert cache.seen('Ev1')
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from props.bot.directory import UserDirectory
+from props.bot.models import Event, Member
+
+class FakeSlack:
+    '''
+    serves users.list in two pages
+    '''
+    def __init__(self):
+        self.calls = []
+
+    async def api_call(self, method, **kwargs):
+        self.calls.append((method, kwargs))
+        if kwargs.get('cursor') is None:
+            return dict(members=[dict(id='U1', name='alice')], response_metadata=dict(next_cursor='c2'))
+        return dict(members=[dict(id='U2', name='bob'), dict(id='U3', name='gone', deleted=True)])
+
+def test_fetch_follows_cursor(run):
+    '''
+    every page is fetched and deleted members are not indexed
+    '''
+    slack = FakeSlack()
+    directory = UserDirectory(slack, limit=1)
+    run(directory.refresh())
+    assert len(slack.calls) == 2
+    assert slack.calls[1][1]['cursor'] == 'c2'
+    assert directory.id_for('bob') == 'U2'
+    assert directory.name_for('U1') == 'alice'
+    assert 'gone' not in directory
+
+def test_refresher_retries_with_backoff(run):
+    '''
+    a failed load is retried after the backoff, doubling, instead of after a whole ttl
+    '''
+    class FlakySlack(FakeSlack):
+        def __init__(self, failures):
+            super().__init__()
+            self.failures = failures
+
+        async def api_call(self, method, **kwargs):
+            if self.failures:
+                self.failures -= 1
+                self.calls.append((method, kwargs))
+                return dict(ok=False, error='internal_error')
+            return await super().api_call(method, **kwargs)
+
+    async def scenario():
+        slack = FlakySlack(failures=3)
+        directory = UserDirectory(slack, ttl=300, backoff=0.01, maxbackoff=0.02)
+        directory.start()
+        for _ in range(100):
+            if directory.refreshed is not None:
+                break
+            await asyncio.sleep(0.01)
+        await directory.stop()
+        return slack, directory
+
+    slack, directory = run(scenario())
+    assert directory.refreshed is not None
+    assert len(slack.calls) == 5
+    assert directory.id_for('alice') == 'U1'
+
+def test_apply_user_change():
+    '''
+    renames and team joins are applied incrementally
+    '''
+    directory = UserDirectory()
+    directory.load([Member('U1', 'alice')])
+    directory.apply(Event.from_json(dict(type='user_change', user=dict(id='U1', name='alicia'))))
+    directory.apply(Event.from_json(dict(type='team_join', user=dict(id='U2', name='bob'))))
+    assert 'alice' not in directory
+    assert directory.id_for('alicia') == 'U1'
+    assert directory.name_for('U2') == 'bob'
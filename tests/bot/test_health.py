@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from props.bot.health import Health
+
+def test_warmup_and_ready(run):
+    '''
+    steps run concurrently and are recorded; readiness follows warm-up and the cached checks
+    '''
+    state = dict(loaded=False)
+
+    async def load():
+        await asyncio.sleep(0.01)
+        state['loaded'] = True
+
+    async def broken():
+        raise RuntimeError('slack is down')
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def unreachable():
+        return False
+
+    health = Health(checks=dict(loaded=lambda: state['loaded']), timeout=0.1)
+    assert health.ready() == (False, dict(warm=False, loaded=False))
+    run(health.warmup(load=load, broken=broken, slow=slow, unreachable=unreachable))
+    assert health.ready() == (True, dict(warm=True, loaded=True))
+    assert {name: step['ok'] for name, step in health.steps.items()} == dict(load=True, broken=False, slow=False, unreachable=False)
+    assert health.steps['broken']['error'] == 'slack is down'
+    assert health.steps['slow']['error'] == 'TimeoutError'
+
+def test_reports_do_not_gate(run):
+    '''
+    reports are shown with the checks but a failing one leaves the service ready
+    '''
+    health = Health(checks=dict(pipeline=lambda: True), reports=dict(slack=lambda: False))
+    run(health.warmup())
+    assert health.ready() == (True, dict(warm=True, pipeline=True, slack=False))
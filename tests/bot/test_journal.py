@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+from props.bot.journal import Journal, read, recover, compact, JOURNAL
+
+ALICE = ('global', 'alice', 'props')
+BOB = ('C2', 'bob', 'docs')
+
+def mutate(journal, key, *deltas):
+    for delta in deltas:
+        journal.append('U1', key, '+=', str(delta), delta)
+
+def test_replay(tmpdir, run):
+    '''
+    committed records are replayed on the next open
+    '''
+    async def scenario():
+        journal = Journal(str(tmpdir), interval=60)
+        assert await journal.open() == {}
+        mutate(journal, ALICE, 1, 2)
+        mutate(journal, BOB, -1)
+        await journal.close()
+        journal = Journal(str(tmpdir), interval=60)
+        try:
+            return await journal.open(), journal.seq
+        finally:
+            await journal.close()
+
+    assert run(scenario()) == ({ALICE: 3, BOB: -1}, 3)
+
+def test_snapshot_and_compact(tmpdir, run):
+    '''
+    snapshots cover the records they truncate and compact folds the rest
+    '''
+    async def scenario():
+        journal = Journal(str(tmpdir), interval=60, every=2)
+        await journal.open()
+        mutate(journal, ALICE, 1, 1)
+        await journal.flush()
+        mutate(journal, ALICE, 1)
+        await journal.close()
+        return journal.path
+
+    path = run(scenario())
+    assert read(path)[:3] == ({ALICE: 3}, 3, 2)
+    assert compact(str(tmpdir)) == 1
+    assert read(path) == ({ALICE: 3}, 3, 3, 0)
+
+def test_torn_tail(tmpdir, run):
+    '''
+    a torn record is cut off on open so later records stay reachable
+    '''
+    async def session(*deltas):
+        journal = Journal(str(tmpdir), interval=60)
+        recovered = await journal.open()
+        mutate(journal, ALICE, *deltas)
+        await journal.close()
+        return recovered, journal.path
+
+    _, path = run(session(1, 1, 1))
+    with open(os.path.join(path, JOURNAL), 'a') as f:
+        f.write('{"seq": 4, "na')
+    recovered, _ = run(session(1, 1, 1, 1, 1))
+    assert recovered == {ALICE: 3}
+    recovered, _ = run(session())
+    assert recovered == {ALICE: 8}
+
+def test_journal_per_process(tmpdir, run):
+    '''
+    concurrent journals claim their own directories; recovery sums them all
+    '''
+    async def scenario():
+        one = Journal(str(tmpdir), interval=60, every=1)
+        two = Journal(str(tmpdir), interval=60, every=1)
+        await one.open()
+        await two.open()
+        mutate(one, ALICE, 1)
+        mutate(two, ALICE, 2)
+        await one.flush()
+        mutate(two, BOB, 5)
+        paths = one.path, two.path
+        await one.close()
+        await two.close()
+        return paths
+
+    one, two = run(scenario())
+    assert one != two
+    assert read(one)[:2] == ({ALICE: 1}, 1)
+    assert read(two)[:2] == ({ALICE: 2, BOB: 5}, 2)
+    assert recover(str(tmpdir)) == {ALICE: 3, BOB: 5}
+
+def test_adopt_shared_journal(tmpdir):
+    '''
+    a journal written before per-process journals is still recovered
+    '''
+    tmpdir.join(JOURNAL).write('{"seq": 1, "name": "alice", "prop": "props", "delta": 4}\n')
+    assert recover(str(tmpdir)) == {ALICE: 4}
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from props.bot.leaderboard import Leaderboard
+
+def test_rank_updates():
+    '''
+    rankings follow value changes and ties break by name
+    '''
+    leaderboard = Leaderboard()
+    leaderboard.load({('global', 'alice', 'props'): 3, ('global', 'bob', 'props'): 5, ('global', 'bob', 'docs'): 1})
+    assert leaderboard.top('props') == [('bob', 5), ('alice', 3)]
+    leaderboard.set(('global', 'alice', 'props'), 7)
+    leaderboard.set(('global', 'carol', 'props'), 5)
+    assert leaderboard.top('props', 2) == [('alice', 7), ('bob', 5)]
+    assert leaderboard.top('props') == [('alice', 7), ('bob', 5), ('carol', 5)]
+    assert leaderboard.show('bob') == {'props': 5, 'docs': 1}
+    assert leaderboard.top('nope') == []
+
+def test_scopes():
+    '''
+    every scope ranks on its own
+    '''
+    leaderboard = Leaderboard()
+    leaderboard.update({('global', 'alice', 'props'): 3, ('C2', 'alice', 'props'): 1, ('C2', 'bob', 'props'): 2})
+    assert leaderboard.top('props') == [('alice', 3)]
+    assert leaderboard.top('props', scope='C2') == [('bob', 2), ('alice', 1)]
+    assert leaderboard.show('alice', scope='C2') == {'props': 1}
+    assert leaderboard.props('C2') == ['props']
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from decouple import UndefinedValueError
+
+os.environ.setdefault('SLACK_VERIFICATION_TOKEN', 'token')
+os.environ.setdefault('SLACK_TEAM_ID', 'T1')
+os.environ.setdefault('PROPS_BOT_CHANNEL_ID', 'C1')
+os.environ.setdefault('BOT_USER_OAUTH_ACCESS_TOKEN', 'xoxb-test')
+
+from props.bot import main #pylint: disable=wrong-import-position
+from props.bot.models import Event #pylint: disable=wrong-import-position
+from props.bot.propsbot import PropsBot #pylint: disable=wrong-import-position
+from props.bot.store import MemoryStore, SQLiteStore #pylint: disable=wrong-import-position
+from props.bot.leaderboard import Leaderboard #pylint: disable=wrong-import-position
+from props.bot.health import Health #pylint: disable=wrong-import-position
+from props.bot.dedupe import DedupeCache #pylint: disable=wrong-import-position
+from props.bot.profiling import Profiler, sign, HEADER #pylint: disable=wrong-import-position
+
+class Outbox:
+    '''
+    collects replies instead of posting them
+    '''
+    def __init__(self):
+        self.posted = []
+
+    def post(self, channel, message):
+        self.posted.append((channel, message))
+
+class Pipeline:
+    '''
+    records submitted events; refuses them while full
+    '''
+    def __init__(self):
+        self.full = False
+        self.submitted = []
+        self.events = []
+
+    def submit(self, event):
+        if self.full:
+            return False
+        self.submitted.append(event.event_id)
+        self.events.append(event)
+        return True
+
+def payload(event_id):
+    '''
+    an events_api payload carrying props
+    '''
+    return dict(
+        token=main.CFG.SLACK_VERIFICATION_TOKEN,
+        team_id=main.CFG.SLACK_TEAM_ID,
+        event_id=event_id,
+        event=dict(type='message', channel='C1', user='U1', text='user1++'))
+
+def test_ingest_dedupes_retries(monkeypatch, run):
+    '''
+    redeliveries are acked without reaching the pipeline; a 503 forgets the event so its retry is queued
+    '''
+    pipeline = Pipeline()
+    monkeypatch.setattr(main, 'PIPELINE', pipeline)
+    monkeypatch.setattr(main, 'DEDUPE', DedupeCache())
+    assert run(main.ingest(payload('Ev1'))) == 200
+    assert run(main.ingest(payload('Ev1'))) == 200
+    assert pipeline.submitted == ['Ev1']
+    pipeline.full = True
+    assert run(main.ingest(payload('Ev2'))) == 503
+    pipeline.full = False
+    assert run(main.ingest(payload('Ev2'))) == 200
+    assert run(main.ingest(payload('Ev2'))) == 200
+    assert pipeline.submitted == ['Ev1', 'Ev2']
+    assert main.DEDUPE.stats == dict(size=2, maxsize=10000, hits=2, misses=3)
+
+def test_ingest_dedupes_across_workers(tmpdir, monkeypatch, run):
+    '''
+    a retry reaching another worker is stopped by the claim in the shared store
+    '''
+    path = str(tmpdir.join('props.sqlite'))
+    pipeline = Pipeline()
+    monkeypatch.setattr(main, 'PIPELINE', pipeline)
+
+    async def worker(*event_ids):
+        monkeypatch.setattr(main, 'DEDUPE', DedupeCache())
+        monkeypatch.setattr(main, 'STORE', SQLiteStore(path))
+        await main.STORE.open()
+        try:
+            return [await main.ingest(payload(event_id)) for event_id in event_ids]
+        finally:
+            await main.STORE.close()
+
+    assert run(worker('Ev1')) == [200]
+    pipeline.full = True
+    assert run(worker('Ev1', 'Ev2')) == [200, 503]
+    pipeline.full = False
+    assert run(worker('Ev2', 'Ev1')) == [200, 200]
+    assert pipeline.submitted == ['Ev1', 'Ev2']
+
+def test_ingest_flags_signed_events(monkeypatch, run):
+    '''
+    an event acked under a signed profile header is queued flagged for its worker
+    '''
+    pipeline = Pipeline()
+    monkeypatch.setattr(main, 'PIPELINE', pipeline)
+    monkeypatch.setattr(main, 'DEDUPE', DedupeCache())
+    monkeypatch.setattr(main, 'PROFILER', Profiler('/nonexistent', secret='secret'))
+
+    async def ingest(event_id, headers):
+        async with main.app.test_request_context('/slack/events', method='POST', headers=headers):
+            return await main.ingest(payload(event_id))
+
+    assert run(ingest('Ev1', {HEADER: sign('secret', int(time.time()))})) == 200
+    assert run(ingest('Ev2', {})) == 200
+    assert [(event.event_id, event.profile) for event in pipeline.events] == [('Ev1', True), ('Ev2', False)]
+
+def test_update_reaches_slash_command(monkeypatch, run):
+    '''
+    the first update on a fresh leaderboard is visible to /props-bot right away
+    '''
+    monkeypatch.setattr(main, 'LEADERBOARD', Leaderboard())
+    event = Event('message', channel='C1', user='U1', text='user1++ user2:docs+=3')
+    bot = PropsBot(None, event, store=MemoryStore(), outbox=Outbox(), leaderboard=main.LEADERBOARD)
+    run(bot.update_many(bot.parse_all()))
+    assert bot.outbox.posted == [('C1', 'user1:props => 1\nuser2:docs => 3')]
+    assert main.slash_command('top', 'C1') == 'top props:\n1. user1 => 1'
+    assert main.slash_command('show user2', 'C1') == 'user2:docs => 3'
+
+def test_buildinfo_undefined_is_a_failed_step(monkeypatch, run):
+    '''
+    without git, buildinfo.json or env the buildinfo warm-up step fails instead of startup
+    '''
+    class Cfg:
+        def __getattr__(self, name):
+            raise UndefinedValueError(f'{name} not found')
+
+    monkeypatch.setattr(main, 'CFG', Cfg())
+    health = Health()
+    run(health.warmup(buildinfo=main.buildinfo))
+    assert health.steps['buildinfo']['ok'] is False
+    assert health.steps['buildinfo']['error'] == f'{main.BUILDINFO_KEYS[0]} not found'
+    assert health.ready() == (True, dict(warm=True))
+
+def test_static_etag(monkeypatch, run):
+    '''
+    a matching strong or weak If-None-Match, or *, answers 304; anything else gets the body
+    '''
+    monkeypatch.setitem(main.STATIC, 'version', (b'1.2.3\n', '"abc"'))
+    client = main.app.test_client()
+
+    async def get(tags=None):
+        response = await client.get('/version', headers={'If-None-Match': tags} if tags else {})
+        return response.status_code, response.headers['ETag'], await response.get_data()
+
+    assert run(get()) == (200, '"abc"', b'1.2.3\n')
+    assert run(get('"abc"')) == (304, '"abc"', b'')
+    assert run(get('W/"abc"')) == (304, '"abc"', b'')
+    assert run(get('"xyz", W/"abc"')) == (304, '"abc"', b'')
+    assert run(get('*')) == (304, '"abc"', b'')
+    assert run(get('"xyz"')) == (200, '"abc"', b'1.2.3\n')
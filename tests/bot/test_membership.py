@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+
+from props.bot.membership import ChannelMembership, ChannelsInfoError
+from props.bot.models import Event
+
+class FakeSlack:
+    '''
+    serves channels.info once release is set
+    '''
+    def __init__(self, members):
+        self.members = members
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def api_call(self, method, **kwargs):
+        self.calls.append((method, kwargs['channel']))
+        await self.release.wait()
+        if kwargs['channel'] not in self.members:
+            return dict(ok=False, error='channel_not_found')
+        return dict(channel=dict(id=kwargs['channel'], members=list(self.members[kwargs['channel']])))
+
+def test_members_load_once(run):
+    '''
+    concurrent first callers share one channels.info; later callers hit the loaded set
+    '''
+    async def scenario():
+        slack = FakeSlack(dict(C1=['U1', 'U2']))
+        membership = ChannelMembership(slack)
+        callers = [asyncio.ensure_future(membership.members('C1')) for _ in range(3)]
+        await asyncio.sleep(0)
+        slack.release.set()
+        sets = await asyncio.gather(*callers)
+        sets.append(await membership.members('C1'))
+        return slack, membership, sets
+
+    slack, membership, sets = run(scenario())
+    assert slack.calls == [('channels.info', 'C1')]
+    assert all(members is sets[0] for members in sets)
+    assert sets[0] == {'U1', 'U2'}
+    assert (membership.hits, membership.misses) == (1, 3)
+    assert membership.loading == {}
+
+def test_failed_load_is_retried(run):
+    '''
+    a failed load raises to its caller and leaves nothing cached, so the next caller loads again
+    '''
+    async def scenario():
+        slack = FakeSlack({})
+        slack.release.set()
+        membership = ChannelMembership(slack)
+        with pytest.raises(ChannelsInfoError):
+            await membership.members('C9')
+        slack.members['C9'] = ['U1']
+        return await membership.members('C9'), membership
+
+    members, membership = run(scenario())
+    assert members == {'U1'}
+    assert membership.arrived == {}
+
+def test_apply(run):
+    '''
+    joins and leaves update loaded channels; unloaded channels are left to their first load
+    '''
+    async def scenario():
+        slack = FakeSlack(dict(C1=['U1']))
+        slack.release.set()
+        membership = ChannelMembership(slack)
+        await membership.members('C1')
+        membership.apply(Event('member_joined_channel', channel='C1', user='U2'))
+        membership.apply(Event('member_left_channel', channel='C1', user='U1'))
+        membership.apply(Event('member_joined_channel', channel='C2', user='U3'))
+        return membership
+
+    membership = run(scenario())
+    assert membership.channels == dict(C1={'U2'})
+
+def test_apply_during_load(run):
+    '''
+    events arriving while the channel loads are replayed onto the loaded snapshot
+    '''
+    async def scenario():
+        slack = FakeSlack(dict(C1=['U1', 'U2']))
+        membership = ChannelMembership(slack)
+        loading = asyncio.ensure_future(membership.members('C1'))
+        await asyncio.sleep(0)
+        membership.apply(Event('member_joined_channel', channel='C1', user='U3'))
+        membership.apply(Event('member_left_channel', channel='C1', user='U1'))
+        slack.release.set()
+        return await loading, membership
+
+    members, membership = run(scenario())
+    assert members == membership.channels['C1'] == {'U2', 'U3'}
+    assert membership.arrived == {}
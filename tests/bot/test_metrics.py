@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from props.bot.metrics import Counter, Histogram, Callback
+
+def test_counter_render():
+    '''
+    label values are rendered in label order and escaped
+    '''
+    calls = Counter('calls_total', 'calls', ['method', 'status'])
+    calls.inc('chat.postMessage', 'ok')
+    calls.inc('chat.postMessage', 'ok')
+    calls.inc('users.list', 'say "hi"')
+    assert calls.render().splitlines() == [
+        '# HELP calls_total calls',
+        '# TYPE calls_total counter',
+        'calls_total{method="chat.postMessage",status="ok"} 2',
+        'calls_total{method="users.list",status="say \\"hi\\""} 1',
+    ]
+
+def test_histogram_is_cumulative():
+    '''
+    bucket counts accumulate up to +Inf
+    '''
+    seconds = Histogram('seconds', 'latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        seconds.observe(value)
+    lines = seconds.render().splitlines()[2:]
+    assert lines == [
+        'seconds_bucket{le="0.1"} 1',
+        'seconds_bucket{le="1.0"} 3',
+        'seconds_bucket{le="+Inf"} 4',
+        'seconds_sum 6.05',
+        'seconds_count 4',
+    ]
+
+def test_callback():
+    '''
+    callbacks are read at render time
+    '''
+    depth = Callback('depth', 'queue depth', lambda: 7)
+    assert depth.render().splitlines()[-1] == 'depth 7'
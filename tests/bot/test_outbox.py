@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from props.bot import outbox
+from props.bot.outbox import TokenBucket, Outbox
+
+class Clock:
+    '''
+    monotonic clock moved by hand
+    '''
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+class Slack:
+    '''
+    records chat.postMessage calls; answers ratelimited to the first limited calls
+    '''
+    def __init__(self, limited=0):
+        self.limited = limited
+        self.posts = []
+
+    async def api_call(self, method, **kwargs):
+        if self.limited:
+            self.limited -= 1
+            return dict(ok=False, error='ratelimited', retry_after=0.05)
+        self.posts.append((method, kwargs['channel'], kwargs['text']))
+        return dict(ok=True)
+
+def test_token_bucket(monkeypatch):
+    '''
+    burst tokens up front, then one every 1 / rate seconds; penalize pushes the next one out
+    '''
+    clock = Clock()
+    monkeypatch.setattr(outbox, 'time', clock)
+    bucket = TokenBucket(rate=2.0, burst=2)
+    assert [bucket.take(), bucket.take(), bucket.take()] == [0, 0, 0.5]
+    clock.now = 0.5
+    assert [bucket.take(), bucket.take()] == [0, 0.5]
+    bucket.penalize(3)
+    assert bucket.take() == 3.0
+    clock.now = 3.5
+    assert bucket.take() == 0
+
+def test_outbox_merges_lines(run):
+    '''
+    replies posted within the window go out as one message of at most maxlines lines
+    '''
+    async def scenario():
+        slack = Slack()
+        box = Outbox(slack, rate=100.0, burst=1, window=0.01, maxlines=3)
+        box.post('C1', 'alice => 1\nbob => 2')
+        box.post('C1', 'carol => 3\ndave => 4')
+        box.post('C2', 'erin => 5')
+        await asyncio.sleep(0)
+        await box.close()
+        return sorted(slack.posts, key=lambda post: post[1])
+
+    assert run(scenario()) == [
+        ('chat.postMessage', 'C1', 'alice => 1\nbob => 2\ncarol => 3'),
+        ('chat.postMessage', 'C1', 'dave => 4'),
+        ('chat.postMessage', 'C2', 'erin => 5'),
+    ]
+
+def test_outbox_requeues_ratelimited(run):
+    '''
+    lines refused with ratelimited are put back in front and posted after retry_after
+    '''
+    async def scenario():
+        slack = Slack(limited=1)
+        box = Outbox(slack, rate=100.0, burst=1, window=0.01)
+        box.post('C1', 'alice => 1')
+        await asyncio.sleep(0.02)
+        box.post('C1', 'bob => 2')
+        await box.close()
+        return slack.posts
+
+    assert run(scenario()) == [('chat.postMessage', 'C1', 'alice => 1\nbob => 2')]
+
+def test_outbox_close_drops_after_timeout(run, caplog):
+    '''
+    close gives up after timeout while slack keeps answering ratelimited and logs the dropped lines
+    '''
+    async def scenario():
+        slack = Slack(limited=1000)
+        box = Outbox(slack, rate=100.0, burst=1, window=0.01, timeout=0.1)
+        box.post('C1', 'alice => 1\nbob => 2')
+        await box.close()
+        return slack, box
+
+    slack, box = run(scenario())
+    assert slack.posts == []
+    assert (box.tasks, box.pending) == ({}, {})
+    assert 'dropping 2 lines to C1' in caplog.text
+
+def test_outbox_logs_errors(run, caplog):
+    '''
+    other non-ok answers drop the lines with the error logged
+    '''
+    class Refusing(Slack):
+        async def api_call(self, method, **kwargs):
+            return dict(ok=False, error='not_in_channel')
+
+    async def scenario():
+        box = Outbox(Refusing(), rate=100.0, burst=1, window=0.01)
+        box.post('C1', 'alice => 1')
+        await box.close()
+        return box
+
+    assert run(scenario()).pending == {}
+    assert 'chat.postMessage to C1 failed; dropping 1 lines: not_in_channel' in caplog.text
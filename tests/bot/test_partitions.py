@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from props.bot.partitions import Partitions, parse_channels
+from props.bot.pipeline import EventPipeline
+from props.bot.models import Event
+
+def test_parse_channels():
+    '''
+    bare channels take the default namespace
+    '''
+    assert parse_channels('C1, C2:channel,C3:eng,', 'global') == {'C1': 'global', 'C2': 'channel', 'C3': 'eng'}
+
+def test_partitions():
+    '''
+    partitions are created on first use with their own or a shared scope
+    '''
+    partitions = Partitions(parse_channels('C1,C2:channel,C3:eng,C4:eng'))
+    assert len(partitions) == 0
+    assert partitions.get('C1').scope == 'global'
+    assert partitions.get('C2').scope == 'C2'
+    assert partitions.get('C3').scope == partitions.get('C4').scope == 'eng'
+    assert partitions.get('C9') is None
+    assert partitions.scope_for('C9') == 'global'
+    assert partitions.scopes == ['C2', 'eng', 'global']
+    assert Partitions(parse_channels('*:channel')).get('C9').scope == 'C9'
+
+def test_pipeline_share(run):
+    '''
+    a hot channel cannot fill more than its share of the queue
+    '''
+    async def handler(event):
+        pass
+
+    async def scenario():
+        pipeline = EventPipeline(handler, maxsize=4, workers=1, partition=lambda event: event.channel, share=0.5)
+        pipeline.start()
+        accepted = [pipeline.submit(Event('message', channel=channel)) for channel in ['C1', 'C1', 'C1', 'C2']]
+        await pipeline.stop()
+        return accepted, pipeline.queued
+
+    accepted, queued = run(scenario())
+    assert accepted == [True, True, False, True]
+    assert queued == {}
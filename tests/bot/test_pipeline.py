@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from props.bot.pipeline import EventPipeline
+from props.bot.models import Event
+
+def test_stop_drains(run):
+    '''
+    events queued before stop() are all handled before the workers go away
+    '''
+    handled = []
+
+    async def handler(event):
+        await asyncio.sleep(0.001)
+        handled.append(event.text)
+
+    async def scenario():
+        pipeline = EventPipeline(handler, maxsize=10, workers=2, timeout=5)
+        pipeline.start()
+        accepted = [pipeline.submit(Event('message', text=str(number))) for number in range(10)]
+        accepted.append(pipeline.submit(Event('message', text='10')))
+        await pipeline.stop()
+        return accepted, pipeline
+
+    accepted, pipeline = run(scenario())
+    assert accepted == [True] * 10 + [False]
+    assert sorted(handled, key=int) == [str(number) for number in range(10)]
+    assert pipeline.tasks == []
+    assert pipeline.stats == dict(depth=0, maxsize=10, workers=0, processed=10, failed=0, dropped=1)
+
+def test_stop_timeout(run):
+    '''
+    stop() gives up on a queue that does not drain within timeout
+    '''
+    async def handler(event):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        pipeline = EventPipeline(handler, maxsize=10, workers=1, timeout=0.05)
+        pipeline.start()
+        for number in range(3):
+            pipeline.submit(Event('message', text=str(number)))
+        await pipeline.stop()
+        return pipeline
+
+    pipeline = run(scenario())
+    assert pipeline.tasks == []
+    assert pipeline.processed == 0
+    assert pipeline.depth == 2
+
+def test_failures_counted(run):
+    '''
+    a failing handler is counted and logged without stopping its worker
+    '''
+    async def handler(event):
+        if event.text == 'boom':
+            raise ValueError(event.text)
+
+    async def scenario():
+        pipeline = EventPipeline(handler, maxsize=10, workers=1, partition=lambda event: event.channel)
+        pipeline.start()
+        for text in ['ok', 'boom', 'ok', 'boom', 'ok']:
+            pipeline.submit(Event('message', channel='C1', text=text))
+        await pipeline.stop()
+        return pipeline
+
+    pipeline = run(scenario())
+    assert (pipeline.processed, pipeline.failed) == (3, 2)
+    assert pipeline.queued == {}
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import hmac
+import time
+import hashlib
+
+from quart import Quart
+
+from props.bot.profiling import Profiler, sign, HEADER
+from props.bot.models import Event
+
+APP = Quart(__name__)
+
+async def handler(event):
+    '''
+    handler
+    '''
+    return event.text
+
+def test_sign():
+    '''
+    the header value is the timestamp and its hmac-sha256 under the secret
+    '''
+    digest = hmac.new(b'secret', b'1500000000', hashlib.sha256).hexdigest()
+    assert sign('secret', 1500000000) == f'1500000000:{digest}'
+    assert sign('other', 1500000000) != sign('secret', 1500000000)
+
+def test_signed(run):
+    '''
+    only a fresh header signed with the secret asks for a profile, and only inside a request
+    '''
+    profiler = Profiler('/nonexistent', secret='secret', window=300)
+    now = int(time.time())
+
+    async def signed(value=None):
+        async with APP.test_request_context('/', headers={HEADER: value} if value else {}):
+            return profiler.signed()
+
+    assert run(signed(sign('secret', now)))
+    assert not run(signed())
+    assert not run(signed(sign('other', now)))
+    assert not run(signed(sign('secret', now - 301)))
+    assert not run(signed(f'{now}:nothex'))
+    assert not profiler.signed()
+    assert not Profiler('/nonexistent').signed()
+
+def test_wants():
+    '''
+    sampling follows rate, a flagged argument always asks, and profiles never nest
+    '''
+    assert Profiler('/nonexistent', rate=1.0).wants()
+    assert not Profiler('/nonexistent', rate=0.0, secret='secret').wants(Event('message'))
+    profiler = Profiler('/nonexistent', secret='secret')
+    assert profiler.wants(Event('message', profile=True))
+    profiler.active = True
+    assert not profiler.wants(Event('message', profile=True))
+
+def test_profiled(tmpdir, run):
+    '''
+    disabled profiling returns the function itself; a flagged event is profiled and dumped
+    '''
+    path = str(tmpdir.join('profiles'))
+    assert Profiler(path).profiled(handler) is handler
+    profiled = Profiler(path, secret='secret').profiled(handler)
+    assert profiled is not handler
+    assert run(profiled(Event('message', text='plain'))) == 'plain'
+    assert not os.path.exists(path)
+    assert run(profiled(Event('message', text='flagged', profile=True))) == 'flagged'
+    assert [name.split('-')[0] for name in os.listdir(path)] == ['handler']
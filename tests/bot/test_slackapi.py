@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from props.bot import slackapi
+from props.bot.slackapi import SlackAPI, NoTokenError
+from tests.bench.fakeslack import FakeSlack
+
+def calls(method, status):
+    return slackapi.API_CALLS.values.get((method, status), 0)
+
+def test_open_without_token(run):
+    '''
+    a missing token raises instead of authorizing with "Bearer None"
+    '''
+    async def scenario():
+        slack = SlackAPI(token='')
+        with pytest.raises(NoTokenError):
+            await slack.open()
+        with pytest.raises(NoTokenError):
+            await slack.api_call('auth.test')
+        return slack
+
+    assert run(scenario()).session is None
+
+def test_api_call_ratelimited(run):
+    '''
+    a 429 answers error=ratelimited with the Retry-After seconds and is counted as ratelimited
+    '''
+    async def scenario():
+        fake = FakeSlack(users=1, ratelimit=1.0)
+        slack = SlackAPI(token='xoxb-test', url=await fake.start())
+        try:
+            return await slack.api_call('chat.postMessage', channel='C1', text='alice => 1')
+        finally:
+            await slack.close()
+            await fake.stop()
+
+    ratelimited = slackapi.API_RATELIMITED.values.get(('chat.postMessage',), 0)
+    before = calls('chat.postMessage', 'ratelimited')
+    assert run(scenario()) == dict(ok=False, error='ratelimited', retry_after=1)
+    assert slackapi.API_RATELIMITED.values[('chat.postMessage',)] == ratelimited + 1
+    assert calls('chat.postMessage', 'ratelimited') == before + 1
+
+def test_api_call_metrics(run):
+    '''
+    every call is timed and counted by method and outcome
+    '''
+    async def scenario():
+        fake = FakeSlack(users=1)
+        slack = SlackAPI(token='xoxb-test', url=await fake.start())
+        try:
+            return await slack.api_call('auth.test')
+        finally:
+            await slack.close()
+            await fake.stop()
+
+    before = calls('auth.test', 'ok')
+    observed = slackapi.API_SECONDS.values.get(('auth.test',), [None, 0.0, 0])[2]
+    assert run(scenario()) == dict(ok=True)
+    assert calls('auth.test', 'ok') == before + 1
+    assert slackapi.API_SECONDS.values[('auth.test',)][2] == observed + 1
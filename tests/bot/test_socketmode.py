@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from props.bot.slackapi import SlackAPI
+from props.bot.socketmode import SocketMode
+from tests.bench.fakeslack import FakeSlack
+
+async def wait_for(predicate, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+def test_socket_mode(run):
+    '''
+    envelopes reach their handler and are acked in-band, a full queue withholds
+    the ack, slash commands reply on the ack and a disconnect reconnects
+    '''
+    received = []
+
+    async def events_api(payload):
+        received.append(payload)
+        return None if payload.get('full') else {}
+
+    async def slash_commands(payload):
+        return dict(text=f'echo {payload["text"]}')
+
+    async def scenario():
+        fake = FakeSlack(users=1)
+        slack = SlackAPI(token='xoxb-test', url=await fake.start())
+        socket = SocketMode(slack, 'xapp-test', dict(events_api=events_api, slash_commands=slash_commands))
+        socket.start()
+        try:
+            assert await wait_for(lambda: fake.sockets and socket.connected)
+            first = await fake.push('events_api', dict(event=dict(type='message', text='alice++')))
+            await fake.push('events_api', dict(full=True))
+            third = await fake.push('slash_commands', dict(text='top'))
+            assert await wait_for(lambda: len(fake.acks) == 2)
+            await fake.disconnect()
+            assert await wait_for(lambda: fake.calls['apps.connections.open'] == 2 and fake.sockets)
+            return received, fake.acks, first, third
+        finally:
+            await socket.stop()
+            await slack.close()
+            await fake.stop()
+
+    received, acks, first, third = run(scenario())
+    assert len(received) == 2
+    assert acks == [dict(envelope_id=first), dict(envelope_id=third, payload=dict(text='echo top'))]
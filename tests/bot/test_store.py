@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import uuid
+
+import pytest
+
+from props.bot import store as stores
+from props.bot.store import make_store, MemoryStore, PostgresStore, SQLiteStore, WriteBehindStore, UnknownStoreError
+
+class Cfg:
+    '''
+    minimal stand-in for CFG
+    '''
+    def __init__(self, backend, write_behind=False):
+        self.PROPS_STORE = backend
+        self.PROPS_WRITE_BEHIND = write_behind
+        self.PROPS_FLUSH_SIZE = 100
+        self.PROPS_FLUSH_INTERVAL = 1.0
+        self.SQLITE_PATH = 'props.sqlite'
+        self.SQLITE_MMAP_SIZE = 0
+        self.SQLITE_SYNCHRONOUS = 'NORMAL'
+
+def test_memory_store_incr(run):
+    '''
+    increments accumulate per (name, prop) key
+    '''
+    store = MemoryStore()
+    assert run(store.incr(('alice', 'props'), 1)) == 1
+    assert run(store.incr_many({('alice', 'props'): 2, ('bob', 'docs'): -1})) == {
+        ('alice', 'props'): 3,
+        ('bob', 'docs'): -1,
+    }
+    assert run(store.get(('carol', 'props'))) == 0
+    assert run(store.items()) == {('alice', 'props'): 3, ('bob', 'docs'): -1}
+
+def test_make_store():
+    '''
+    backends are selected by name
+    '''
+    assert isinstance(make_store(Cfg('memory')), MemoryStore)
+    assert isinstance(make_store(Cfg('memory', write_behind=True)), MemoryStore)
+    assert isinstance(make_store(Cfg('sqlite')), SQLiteStore)
+    assert isinstance(make_store(Cfg('sqlite', write_behind=True)), WriteBehindStore)
+    with pytest.raises(UnknownStoreError):
+        make_store(Cfg('nope'))
+
+def test_sqlite_store(tmpdir, run):
+    '''
+    increments are batched into one transaction and survive a reopen
+    '''
+    path = str(tmpdir.join('props.sqlite'))
+
+    async def scenario():
+        store = SQLiteStore(path)
+        await store.open()
+        assert await store.incr(('global', 'alice', 'props'), 1) == 1
+        values = await store.incr_many({('global', 'alice', 'props'): 2, ('C2', 'bob', 'docs'): -1})
+        await store.close()
+        store = SQLiteStore(path)
+        await store.open()
+        try:
+            return values, await store.items(), await store.get(('global', 'carol', 'props'))
+        finally:
+            await store.close()
+
+    values, items, missing = run(scenario())
+    assert values == items == {('global', 'alice', 'props'): 3, ('C2', 'bob', 'docs'): -1}
+    assert missing == 0
+
+def test_sqlite_store_claims(tmpdir, monkeypatch, run):
+    '''
+    an event id is claimed once per ttl across connections; unclaimed ids and expired claims are taken again
+    '''
+    path = str(tmpdir.join('props.sqlite'))
+    clock = dict(now=1000.0)
+    monkeypatch.setattr(stores.time, 'time', lambda: clock['now'])
+
+    async def scenario():
+        one, two = SQLiteStore(path, purge_every=3), SQLiteStore(path)
+        await one.open()
+        await two.open()
+        try:
+            claims = [await one.claim('Ev1', 10), await two.claim('Ev1', 10), await two.claim('Ev2', 10)]
+            await two.unclaim('Ev2')
+            claims.append(await one.claim('Ev2', 10))
+            clock['now'] += 10.5
+            claims.append(await two.claim('Ev1', 10))
+            claims.append(await one.claim('Ev3', 10))
+            rows = one.conn.execute('SELECT event_id FROM props_events ORDER BY event_id').fetchall()
+            return claims, rows
+        finally:
+            await one.close()
+            await two.close()
+
+    claims, rows = run(scenario())
+    assert claims == [True, False, True, True, True, True]
+    assert rows == [('Ev1',), ('Ev3',)]
+
+def test_write_behind_coalesces(run):
+    '''
+    reads include pending deltas and a flush writes them in one batch
+    '''
+    class CountingStore(MemoryStore):
+        def __init__(self):
+            super().__init__()
+            self.batches = []
+
+        async def incr_many(self, deltas):
+            self.batches.append(dict(deltas))
+            return await super().incr_many(deltas)
+
+    async def scenario():
+        backing = CountingStore()
+        store = WriteBehindStore(backing, size=100, interval=60)
+        await store.open()
+        for _ in range(5):
+            await store.incr(('alice', 'props'), 1)
+        assert await store.incr(('bob', 'props'), 2) == 2
+        assert await store.get(('alice', 'props')) == 5
+        assert backing.batches == []
+        await store.close()
+        return backing
+
+    backing = run(scenario())
+    assert backing.batches == [{('alice', 'props'): 5, ('bob', 'props'): 2}]
+    assert backing.values[('alice', 'props')] == 5
+
+def test_write_behind_caches_reads(run):
+    '''
+    a key is read from the backing store once per flush interval, so other writers' increments show up after a flush
+    '''
+    class CountingStore(MemoryStore):
+        def __init__(self):
+            super().__init__()
+            self.reads = []
+
+        async def get(self, key):
+            self.reads.append(key)
+            return await super().get(key)
+
+    async def scenario():
+        backing = CountingStore()
+        backing.values[('alice', 'props')] = 10
+        store = WriteBehindStore(backing, size=100, interval=60)
+        await store.open()
+        values = [await store.incr(('alice', 'props'), 1) for _ in range(3)]
+        await store.flush()
+        assert store.base == {}
+        backing.values[('alice', 'props')] += 100
+        values.append(await store.incr(('alice', 'props'), 1))
+        await store.flush()
+        values.append(await store.incr(('alice', 'props'), 1))
+        await store.close()
+        return backing, values
+
+    backing, values = run(scenario())
+    assert backing.reads == [('alice', 'props')] * 3
+    assert values == [11, 12, 13, 114, 115]
+    assert backing.values[('alice', 'props')] == 115
+
+class Pool:
+    '''
+    stand-in for an asyncpg pool that records every statement and answers fetches with canned rows
+    '''
+    def __init__(self, rows=None, value=None):
+        self.rows = rows or []
+        self.value = value
+        self.calls = []
+
+    def acquire(self):
+        return self
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def execute(self, query, *args):
+        self.calls.append(('execute', query, args))
+
+    async def fetch(self, query, *args):
+        self.calls.append(('fetch', query, args))
+        return self.rows
+
+    async def fetchval(self, query, *args):
+        self.calls.append(('fetchval', query, args))
+        return self.value
+
+    async def close(self):
+        self.calls.append(('close',))
+
+def test_postgres_store_statements(monkeypatch, run):
+    '''
+    open creates and migrates the table in one transaction; incr_many is one unnest upsert
+    '''
+    pool = Pool(rows=[dict(scope='global', name='alice', prop='props', value=3), dict(scope='C2', name='bob', prop='docs', value=-1)])
+
+    async def create_pool(dsn, min_size, max_size):
+        assert (dsn, min_size, max_size) == ('postgres://props', 1, 4)
+        return pool
+
+    monkeypatch.setattr(stores.asyncpg, 'create_pool', create_pool)
+
+    async def scenario():
+        store = PostgresStore('postgres://props', min_size=1, max_size=4)
+        await store.open()
+        values = await store.incr_many({('global', 'alice', 'props'): 2, ('C2', 'bob', 'docs'): -1})
+        assert await store.incr_many({}) == {}
+        missing = await store.get(('global', 'carol', 'props'))
+        await store.close()
+        return values, missing
+
+    values, missing = run(scenario())
+    assert values == {('global', 'alice', 'props'): 3, ('C2', 'bob', 'docs'): -1}
+    assert missing == 0
+    assert pool.calls == [
+        ('execute', PostgresStore.schema, ()),
+        ('execute', PostgresStore.events, ()),
+    ] + [('execute', migration, ()) for migration in PostgresStore.migrations] + [
+        ('fetch', PostgresStore.upsert, (['global', 'C2'], ['alice', 'bob'], ['props', 'docs'], [2, -1])),
+        ('fetchval', PostgresStore.select, ('global', 'carol', 'props')),
+        ('close',),
+    ]
+    assert 'table_schema = current_schema()' in PostgresStore.migrations[0]
+
+def test_postgres_store_claims(run):
+    '''
+    a claim is one insert returning the event id when this call took it; expired claims are purged periodically
+    '''
+    store = PostgresStore('postgres://props', purge_every=2)
+    store.pool = Pool(value='Ev1')
+    assert run(store.claim('Ev1', 600))
+    store.pool.value = None
+    assert not run(store.claim('Ev1', 600))
+    run(store.unclaim('Ev1'))
+    assert store.pool.calls == [
+        ('fetchval', PostgresStore.claim_event, ('Ev1', 600)),
+        ('execute', PostgresStore.purge, ()),
+        ('fetchval', PostgresStore.claim_event, ('Ev1', 600)),
+        ('execute', PostgresStore.unclaim_event, ('Ev1',)),
+    ]
+
+@pytest.mark.skipif(not os.environ.get('DATABASE_URL'), reason='DATABASE_URL is not set')
+def test_postgres_store(run):
+    '''
+    against a real database: the migration runs, event ids are claimed once, increments return the new totals and survive a reopen
+    '''
+    scope = f'test-{uuid.uuid4().hex}'
+    alice, bob = (scope, 'alice', 'props'), (scope, 'bob', 'docs')
+
+    async def scenario():
+        store = PostgresStore(os.environ['DATABASE_URL'])
+        await store.open()
+        try:
+            claims = [await store.claim(scope, 60), await store.claim(scope, 60)]
+            await store.unclaim(scope)
+            assert claims + [await store.claim(scope, 60)] == [True, False, True]
+            first = await store.incr_many({alice: 2, bob: -1})
+            second = await store.incr_many({alice: 1})
+            await store.close()
+            await store.open()
+            return first, second, await store.get(alice), {key: value for key, value in (await store.items()).items() if key[0] == scope}
+        finally:
+            await store.pool.execute('DELETE FROM props WHERE scope = $1', scope)
+            await store.unclaim(scope)
+            await store.close()
+
+    first, second, value, items = run(scenario())
+    assert first == {alice: 2, bob: -1}
+    assert second == {alice: 3}
+    assert value == 3
+    assert items == {alice: 3, bob: -1}
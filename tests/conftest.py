@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
 
 import sys
+import asyncio
+import pytest
 from pprint import pprint
 
 def pytest_configure(config):
     # added rootdir to sys.path so that imports would work in tests/*
     path = '/'.join([str(config.rootdir), 'bot'])
     sys.path.insert(0, path)
+
+@pytest.fixture
+def run():
+    '''
+    run(coro) drives coro to completion on a fresh event loop, closed after the test
+    '''
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()